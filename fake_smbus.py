@@ -0,0 +1,58 @@
+class FakeSmbus:
+	"""
+	Register map standing in for an SMBus handle in tests; reads
+	of registers that were never set return zero bytes and every
+	transaction is appended to transactions as (operation, device
+	address, command address, data)
+	"""
+
+	def __init__(self, registers=None):
+		self.registers = dict()
+		if registers != None:
+			self.registers.update(registers)
+		self.failing_registers = set()
+		self.transactions = []
+		self.num_reads = 0
+
+	def set_register(self, device_address, command_address, bytes_to_set):
+		self.registers.update({(device_address, command_address) : list(bytes_to_set)})
+
+	def get_register(self, device_address, command_address):
+		return self.registers.get((device_address, command_address))
+
+	def get_writes(self):
+		return [transaction for transaction in self.transactions if transaction[0] != "read_i2c_block_data"]
+
+	def check_failing_register(self, i2c_addr, register):
+		if (i2c_addr, register) in self.failing_registers:
+			raise OSError(5, "Input/output error")
+
+	def read_i2c_block_data(self, i2c_addr, register, length, force=None):
+		self.num_reads += 1
+		self.transactions.append(("read_i2c_block_data", i2c_addr, register, length))
+		self.check_failing_register(i2c_addr, register)
+		return self.registers.get((i2c_addr, register), [0x00] * length)[:length]
+
+	def write_i2c_block_data(self, i2c_addr, register, data, force=None):
+		self.transactions.append(("write_i2c_block_data", i2c_addr, register, list(data)))
+		self.check_failing_register(i2c_addr, register)
+		self.set_register(i2c_addr, register, data)
+
+	def write_byte(self, i2c_addr, value, force=None):
+		self.transactions.append(("write_byte", i2c_addr, value, []))
+		self.check_failing_register(i2c_addr, value)
+
+	def close(self):
+		pass
+
+class FakeSmbusFactory:
+	"""
+	Picklable smbus_factory that opens a FakeSmbus preloaded with
+	the registers given for each bus number
+	"""
+
+	def __init__(self, bus_registers):
+		self.bus_registers = bus_registers
+
+	def __call__(self, smbus_number):
+		return FakeSmbus(self.bus_registers.get(smbus_number))
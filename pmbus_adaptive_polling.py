@@ -0,0 +1,239 @@
+import time
+
+from pmbus_devices import *
+
+class PmbusAdaptivePollingBaseError(Exception):
+	def __init__(self, error_message):
+		super().__init__(error_message)
+		self.error_message = error_message
+
+class PmbusAdaptivePollerNoChannels(PmbusAdaptivePollingBaseError):
+	def __init__(self):
+		super().__init__("Adaptive poller has no channels; add a device before polling")
+
+class PmbusAdaptivePollerInvalidPeriod(PmbusAdaptivePollingBaseError):
+	def __init__(self, min_period, max_period):
+		super().__init__(f"Invalid poll periods; min period {min_period} must be greater than 0 and no greater than max period {max_period}")
+
+class PmbusAdaptivePollerInvalidBackoffFactor(PmbusAdaptivePollingBaseError):
+	def __init__(self, backoff_factor):
+		super().__init__(f"Invalid backoff factor {backoff_factor}; must be at least 1")
+
+class PmbusPollingEvent:
+	"""
+	A reported change or read error; timestamp is wall clock
+	time in seconds since the epoch
+	"""
+
+	def __init__(self, timestamp, device_address, command_name, value, error=None):
+		self.timestamp = timestamp
+		self.device_address = device_address
+		self.command_name = command_name
+		self.value = value
+		self.error = error
+
+	def get_timestamp(self):
+		return self.timestamp
+
+	def get_device_address(self):
+		return self.device_address
+
+	def get_command_name(self):
+		return self.command_name
+
+	def get_value(self):
+		return self.value
+
+	def get_error(self):
+		return self.error
+
+	def __str__(self):
+		if self.error != None:
+			return f"{self.timestamp:.3f} {hex(self.device_address)} {self.command_name}: {self.error}"
+		return f"{self.timestamp:.3f} {hex(self.device_address)} {self.command_name}: {self.value}"
+
+class PmbusPollingChannel:
+	"""
+	A single (device, command) pair with its own deadband and
+	poll period; the period backs off while the value stays
+	inside the deadband and resets once it moves outside it;
+	now is time.monotonic() and is only used for scheduling
+	"""
+
+	def __init__(self, device, command_entry, deadband, min_period, max_period, backoff_factor):
+		self.device = device
+		self.command_entry = command_entry
+		self.deadband = deadband
+		self.min_period = min_period
+		self.max_period = max_period
+		self.backoff_factor = backoff_factor
+		self.period = min_period
+		self.next_poll_time = 0.0
+		self.last_emitted_value = None
+
+	def get_device(self):
+		return self.device
+
+	def get_command_name(self):
+		return self.command_entry.get_command_name()
+
+	def get_period(self):
+		return self.period
+
+	def get_next_poll_time(self):
+		return self.next_poll_time
+
+	def get_deadband(self):
+		return self.deadband
+
+	def get_last_emitted_value(self):
+		return self.last_emitted_value
+
+	def is_due(self, now):
+		return now >= self.next_poll_time
+
+	def wake(self, now):
+		self.period = self.min_period
+		self.next_poll_time = now
+
+	def hold_min_period(self, now):
+		self.period = self.min_period
+		self.next_poll_time = now + self.min_period
+
+	def read_value(self):
+		bytes_read = self.device.read_bytes(self.get_command_name())
+		if self.command_entry.is_linear_data_format():
+			return self.device.get_linear_read_value(self.command_entry, bytes_read)
+		return list(bytes_read)
+
+	def is_outside_deadband(self, value):
+		if self.last_emitted_value == None:
+			return True
+		if self.command_entry.is_linear_data_format():
+			return abs(value - self.last_emitted_value) > self.deadband
+		return value != self.last_emitted_value
+
+	def poll(self, now):
+		try:
+			value = self.read_value()
+		except Exception as err:
+			self.last_emitted_value = None
+			self.wake(now + self.min_period)
+			return PmbusPollingEvent(time.time(), self.device.get_device_address(), self.get_command_name(), None, err)
+
+		if self.is_outside_deadband(value):
+			self.last_emitted_value = value
+			self.period = self.min_period
+			event = PmbusPollingEvent(time.time(), self.device.get_device_address(), self.get_command_name(), value)
+		else:
+			self.period = min(self.period * self.backoff_factor, self.max_period)
+			event = None
+		self.next_poll_time = now + self.period
+		return event
+
+class PmbusAdaptivePoller:
+	"""
+	Polls telemetry channels at a rate that adapts to how much
+	they are changing and only reports changes beyond each
+	channel's deadband; a set STATUS bit on a device returns
+	all of that device's channels to the fastest rate. STATUS
+	channels back off no further than status_max_period so a
+	fault is still noticed promptly on a quiet device
+	"""
+
+	DEFAULT_COMMAND_NAMES = ["READ_VIN", "READ_VOUT", "READ_IOUT", "READ_TEMPERATURE_1"]
+	STATUS_COMMAND_NAME = "STATUS_WORD"
+
+	DEFAULT_DEADBAND_NUM_LSBS = 2
+	DEFAULT_MIN_PERIOD = 0.1
+	DEFAULT_MAX_PERIOD = 5.0
+	DEFAULT_STATUS_MAX_PERIOD = 0.5
+	DEFAULT_BACKOFF_FACTOR = 2.0
+
+	def __init__(self, min_period=DEFAULT_MIN_PERIOD, max_period=DEFAULT_MAX_PERIOD, backoff_factor=DEFAULT_BACKOFF_FACTOR, deadband_num_lsbs=DEFAULT_DEADBAND_NUM_LSBS, status_max_period=DEFAULT_STATUS_MAX_PERIOD):
+		# A zero period would poll the bus as fast as it can be driven
+		if (min_period <= 0) or (max_period < min_period):
+			raise PmbusAdaptivePollerInvalidPeriod(min_period, max_period)
+		if backoff_factor < 1:
+			raise PmbusAdaptivePollerInvalidBackoffFactor(backoff_factor)
+		self.min_period = min_period
+		self.max_period = max_period
+		self.status_max_period = max(min(status_max_period, max_period), min_period)
+		self.backoff_factor = backoff_factor
+		self.deadband_num_lsbs = deadband_num_lsbs
+		self.channels = []
+		self.status_channels = dict()
+
+	def get_default_deadband(self, command_entry):
+		if command_entry.is_linear_data_format():
+			return self.deadband_num_lsbs * (2 ** command_entry.get_exponent())
+		return 0
+
+	def add_channel(self, device, command, deadband=None, max_period=None):
+		# command -> Command Name OR Command Address
+		command_entry = device.get_command_table_entry(command)
+		device.verify_command_read_enabled(command_entry)
+		if deadband == None:
+			deadband = self.get_default_deadband(command_entry)
+		if max_period == None:
+			max_period = self.max_period
+		channel = PmbusPollingChannel(device, command_entry, deadband, self.min_period, max_period, self.backoff_factor)
+		self.channels.append(channel)
+		return channel
+
+	def add_device(self, device, command_names=DEFAULT_COMMAND_NAMES, poll_status=True):
+		for command_name in command_names:
+			self.add_channel(device, command_name)
+		if poll_status:
+			self.status_channels.update({id(device) : self.add_channel(device, PmbusAdaptivePoller.STATUS_COMMAND_NAME, max_period=self.status_max_period)})
+
+	def get_channels(self):
+		return list(self.channels)
+
+	def get_next_poll_time(self):
+		if len(self.channels) == 0:
+			return None
+		return min(channel.get_next_poll_time() for channel in self.channels)
+
+	def poll_once(self, now=None):
+		if now == None:
+			now = time.monotonic()
+
+		events = []
+		for channel in self.channels:
+			if channel.is_due(now):
+				event = channel.poll(now)
+				if event != None:
+					events.append(event)
+				if self.is_status_channel(channel) and self.is_status_bit_set(channel.get_last_emitted_value()):
+					if event != None:
+						self.wake_device_channels(channel.get_device(), now)
+					channel.hold_min_period(now)
+		return events
+
+	def is_status_channel(self, channel):
+		return self.status_channels.get(id(channel.get_device())) is channel
+
+	def is_status_bit_set(self, status_bytes):
+		if status_bytes == None:
+			return False
+		return any(byte_int != 0 for byte_int in status_bytes)
+
+	def wake_device_channels(self, device, now):
+		for channel in self.channels:
+			if channel.get_device() is device:
+				channel.wake(now)
+
+	def run(self, event_callback, duration=None):
+		if len(self.channels) == 0:
+			raise PmbusAdaptivePollerNoChannels()
+		start_time = time.monotonic()
+		while (duration == None) or (time.monotonic() - start_time < duration):
+			for event in self.poll_once():
+				event_callback(event)
+
+			sleep_time = self.get_next_poll_time() - time.monotonic()
+			if duration != None:
+				sleep_time = min(sleep_time, duration - (time.monotonic() - start_time))
+			if sleep_time > 0:
+				time.sleep(sleep_time)
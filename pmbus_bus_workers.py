@@ -0,0 +1,289 @@
+import ctypes
+import multiprocessing
+import time
+
+from pmbus_devices import *
+from pmbus_device_manifest import PmbusDeviceManifest, PmbusDeviceManifestBaseError
+from pmbus_transaction_recording import PmbusSmbusFactory
+
+class PmbusBusWorkerBaseError(Exception):
+	def __init__(self, error_message):
+		super().__init__(error_message)
+		self.error_message = error_message
+
+class PmbusBusWorkerInvalidDeviceType(PmbusBusWorkerBaseError):
+	def __init__(self, device_class_name):
+		super().__init__(f"{device_class_name} is not a valid device type")
+
+class PmbusBusWorkerDeviceAddressAlreadyExists(PmbusBusWorkerBaseError):
+	def __init__(self, bus_number, device_address):
+		super().__init__(f"Device with address {device_address} is already configured on SMBus {bus_number}")
+
+class PmbusBusWorkerPoolAlreadyStarted(PmbusBusWorkerBaseError):
+	def __init__(self):
+		super().__init__("Bus worker pool is already started; stop it before changing its configuration")
+
+class PmbusBusWorkerPoolNotStarted(PmbusBusWorkerBaseError):
+	def __init__(self):
+		super().__init__("Bus worker pool is not started")
+
+class PmbusBusWorkerDied(PmbusBusWorkerBaseError):
+	def __init__(self, bus_number, exit_code):
+		super().__init__(f"Worker process for SMBus {bus_number} exited with code {exit_code}")
+
+class PmbusBusWorkerSharedBufferBusy(PmbusBusWorkerBaseError):
+	def __init__(self, bus_number, timeout):
+		super().__init__(f"SMBus {bus_number} worker held its shared buffers for more than {timeout} seconds")
+
+# Each process gets its own copy, so a worker reads the manifest file at most once
+device_manifest = PmbusDeviceManifest()
+
+def get_pmbus_device_class(device_class_name):
+	try:
+		return device_manifest.get_device_class(device_class_name)
+	except PmbusDeviceManifestBaseError:
+		raise PmbusBusWorkerInvalidDeviceType(device_class_name)
+
+def create_pmbus_device(device_spec, smbus_instance):
+	device_class_name, device_address, command_table_file_path = device_spec
+	if command_table_file_path == None:
+		device_class = get_pmbus_device_class(device_class_name)
+		return device_class(device_address, smbus_instance)
+	return PmbusDevice(device_address, smbus_instance, load_pmbus_command_table(command_table_file_path))
+
+def run_pmbus_bus_worker(bus_number, smbus_factory, device_specs, channels, sample_buffer, status_buffer, sweep_timestamp, sweep_count, buffer_lock, stop_event, poll_period):
+	"""
+	Worker process entry point; opens the SMBus handle with
+	smbus_factory, owns the PmbusDevice instances for a single
+	bus and writes raw read bytes into the shared sample buffer
+	each sweep
+	"""
+	smbus_instance = smbus_factory(bus_number)
+	devices = [create_pmbus_device(device_spec, smbus_instance) for device_spec in device_specs]
+
+	sweep_bytes = bytearray(len(sample_buffer))
+	sweep_status = bytearray(len(status_buffer))
+	try:
+		while not stop_event.is_set():
+			sweep_start = time.monotonic()
+
+			# Slow bus reads go into local buffers so the shared ones are only locked for the copy
+			for device_index, command_name, num_bytes, offset, channel_index in channels:
+				try:
+					bytes_read = devices[device_index].read_bytes(command_name)
+				except Exception:
+					sweep_status[channel_index] = PmbusBusShard.STATUS_READ_ERROR
+					continue
+				# A short read would shrink the slice assignment and shift every later channel
+				if len(bytes_read) < num_bytes:
+					sweep_status[channel_index] = PmbusBusShard.STATUS_READ_ERROR
+					continue
+				sweep_bytes[offset:offset + num_bytes] = bytes(bytes_read[:num_bytes])
+				sweep_status[channel_index] = PmbusBusShard.STATUS_OK
+
+			with buffer_lock:
+				ctypes.memmove(sample_buffer, bytes(sweep_bytes), len(sweep_bytes))
+				ctypes.memmove(status_buffer, bytes(sweep_status), len(sweep_status))
+				sweep_timestamp.value = time.time()
+				sweep_count.value += 1
+
+			sleep_time = poll_period - (time.monotonic() - sweep_start)
+			if sleep_time > 0:
+				stop_event.wait(sleep_time)
+	finally:
+		smbus_instance.close()
+
+class PmbusBusShard:
+	"""
+	Shared memory layout and worker process for the
+	devices on a single SMBus bus
+	"""
+
+	STATUS_NO_DATA = 0
+	STATUS_OK = 1
+	STATUS_READ_ERROR = 2
+
+	DEVICE_SPEC_ADDRESS_INDEX = 1
+
+	BUFFER_LOCK_TIMEOUT = 1.0
+
+	def __init__(self, bus_number):
+		self.bus_number = bus_number
+		self.device_specs = []
+		self.decode_devices = []
+		self.channels = []
+		self.process = None
+
+	def get_bus_number(self):
+		return self.bus_number
+
+	def get_device_addresses(self):
+		return [device_spec[PmbusBusShard.DEVICE_SPEC_ADDRESS_INDEX] for device_spec in self.device_specs]
+
+	def add_device(self, device_class_name, device_address, command_table_file_path=None):
+		if device_address in self.get_device_addresses():
+			raise PmbusBusWorkerDeviceAddressAlreadyExists(self.bus_number, device_address)
+		device_spec = (device_class_name, device_address, command_table_file_path)
+
+		# The parent keeps its own table-only copy of each device for decoding
+		decode_device = create_pmbus_device(device_spec, None)
+		self.device_specs.append(device_spec)
+		self.decode_devices.append(decode_device)
+
+	def allocate_shared_buffers(self, command_names):
+		self.channels = []
+		offset = 0
+		for device_index, decode_device in enumerate(self.decode_devices):
+			for command_name in command_names:
+				command_entry = decode_device.get_command_table_entry(command_name)
+				decode_device.verify_command_read_enabled(command_entry)
+				num_bytes = command_entry.get_num_data_bytes()
+				self.channels.append((device_index, command_entry.get_command_name(), num_bytes, offset, len(self.channels)))
+				offset += num_bytes
+
+		self.sample_buffer = multiprocessing.RawArray('B', max(offset, 1))
+		self.status_buffer = multiprocessing.RawArray('B', max(len(self.channels), 1))
+		self.sweep_timestamp = multiprocessing.RawValue('d', 0.0)
+		self.sweep_count = multiprocessing.RawValue('L', 0)
+		# The worker holds the lock only while copying a finished sweep in
+		self.buffer_lock = multiprocessing.Lock()
+
+	def start(self, command_names, smbus_factory, stop_event, poll_period):
+		self.allocate_shared_buffers(command_names)
+		worker_arguments = (self.bus_number, smbus_factory, self.device_specs, self.channels, self.sample_buffer, self.status_buffer, self.sweep_timestamp, self.sweep_count, self.buffer_lock, stop_event, poll_period)
+		self.process = multiprocessing.Process(target=run_pmbus_bus_worker, args=worker_arguments, name=f"pmbus-bus-{self.bus_number}", daemon=True)
+		self.process.start()
+
+	def join(self, timeout=None):
+		if self.process != None:
+			self.process.join(timeout)
+			if self.process.is_alive():
+				self.process.terminate()
+				self.process.join()
+			self.process = None
+
+	def is_alive(self):
+		return (self.process != None) and self.process.is_alive()
+
+	def verify_alive(self):
+		if not self.is_alive():
+			exit_code = None if self.process == None else self.process.exitcode
+			raise PmbusBusWorkerDied(self.bus_number, exit_code)
+
+	def copy_shared_buffers(self):
+		if not self.buffer_lock.acquire(timeout=PmbusBusShard.BUFFER_LOCK_TIMEOUT):
+			# A worker killed while copying never releases the lock
+			self.verify_alive()
+			raise PmbusBusWorkerSharedBufferBusy(self.bus_number, PmbusBusShard.BUFFER_LOCK_TIMEOUT)
+		try:
+			sample_bytes = bytes(self.sample_buffer)
+			status_bytes = bytes(self.status_buffer)
+			sweep_timestamp = self.sweep_timestamp.value
+			sweep_count = self.sweep_count.value
+		finally:
+			self.buffer_lock.release()
+		return sample_bytes, status_bytes, sweep_timestamp, sweep_count
+
+	def read_samples(self):
+		self.verify_alive()
+		sample_bytes, status_bytes, sweep_timestamp, sweep_count = self.copy_shared_buffers()
+		samples = dict()
+		for device_index, command_name, num_bytes, offset, channel_index in self.channels:
+			decode_device = self.decode_devices[device_index]
+			if status_bytes[channel_index] == PmbusBusShard.STATUS_OK:
+				bytes_read = list(sample_bytes[offset:offset + num_bytes])
+				try:
+					value = self.decode_sample(decode_device, command_name, bytes_read)
+				except PmbusDeviceBaseError:
+					# One bad device must not discard the samples of every other channel
+					value = None
+			else:
+				value = None
+			samples.update({(self.bus_number, decode_device.get_device_address(), command_name) : value})
+		return samples, sweep_timestamp, sweep_count
+
+	def decode_sample(self, decode_device, command_name, bytes_read):
+		command_entry = decode_device.get_command_table_entry(command_name)
+		if command_entry.is_linear_data_format():
+			return decode_device.get_linear_read_value(command_entry, bytes_read)
+		return bytes_read
+
+class PmbusBusWorkerPool:
+	"""
+	Runs one worker process per SMBus bus so that polling
+	and bookkeeping on separate buses do not share the GIL;
+	workers publish raw bytes to shared memory and the parent
+	decodes them on demand. smbus_factory opens each worker's
+	handle from its bus number and must be picklable; pass a
+	recording or replay factory to run the pool without hardware
+	"""
+
+	DEFAULT_COMMAND_NAMES = ["READ_VIN", "READ_VOUT", "READ_IOUT", "READ_TEMPERATURE_1"]
+	DEFAULT_POLL_PERIOD = 0.1
+
+	def __init__(self, command_names=DEFAULT_COMMAND_NAMES, poll_period=DEFAULT_POLL_PERIOD, smbus_factory=None):
+		self.command_names = command_names
+		self.poll_period = poll_period
+		if smbus_factory == None:
+			smbus_factory = PmbusSmbusFactory()
+		self.smbus_factory = smbus_factory
+		self.bus_shards = dict()
+		self.stop_event = None
+
+	def add_device(self, bus_number, device_class_name, device_address, command_table_file_path=None):
+		if self.is_started():
+			raise PmbusBusWorkerPoolAlreadyStarted()
+		if bus_number not in self.bus_shards:
+			self.bus_shards.update({bus_number : PmbusBusShard(bus_number)})
+		self.bus_shards[bus_number].add_device(device_class_name, device_address, command_table_file_path)
+
+	def get_bus_numbers(self):
+		return list(self.bus_shards)
+
+	def is_started(self):
+		return self.stop_event != None
+
+	def start(self):
+		if self.is_started():
+			raise PmbusBusWorkerPoolAlreadyStarted()
+		self.stop_event = multiprocessing.Event()
+		for bus_shard in self.bus_shards.values():
+			bus_shard.start(self.command_names, self.smbus_factory, self.stop_event, self.poll_period)
+
+	def stop(self, timeout=None):
+		if not self.is_started():
+			return
+		self.stop_event.set()
+		for bus_shard in self.bus_shards.values():
+			bus_shard.join(timeout)
+		self.stop_event = None
+
+	def read_samples(self):
+		"""
+		Returns a dict keyed by (bus number, device address, command name)
+		holding the decoded value of the latest completed sweep on each bus,
+		or None where the read failed or no sweep has completed yet
+		"""
+		if not self.is_started():
+			raise PmbusBusWorkerPoolNotStarted()
+		samples = dict()
+		for bus_shard in self.bus_shards.values():
+			bus_samples, sweep_timestamp, sweep_count = bus_shard.read_samples()
+			samples.update(bus_samples)
+		return samples
+
+	def get_sweep_counts(self):
+		if not self.is_started():
+			raise PmbusBusWorkerPoolNotStarted()
+		sweep_counts = dict()
+		for bus_number, bus_shard in self.bus_shards.items():
+			bus_shard.verify_alive()
+			sweep_counts.update({bus_number : bus_shard.copy_shared_buffers()[3]})
+		return sweep_counts
+
+	def __enter__(self):
+		self.start()
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.stop()
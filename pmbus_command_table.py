@@ -2,7 +2,7 @@ import byte_conversion
 
 class PmbusCommandTableBaseError(Exception):
 	def __init__(self, error_message):
-		super().__init__(error_mesage)
+		super().__init__(error_message)
 		self.error_message = error_message
 
 class PmbusCommandTableCommandDNE(PmbusCommandTableBaseError):
@@ -13,6 +13,7 @@ class PmbusCommandTable:
 
 	def __init__(self, file_path):
 		self.command_table = dict()
+		self.command_list = []
 		self.file_path = file_path
 		self.initialize_command_table()
 
@@ -29,6 +30,7 @@ class PmbusCommandTable:
 				read_line = read_line[:-1]
 			command_data = read_line.split(",")
 			new_command_entry = PmbusCommand(command_data)
+			self.command_list.append(new_command_entry)
 			self.add_table_entry(new_command_entry.get_command_name(), new_command_entry)
 			self.add_table_entry(new_command_entry.get_command_address_int(), new_command_entry)
 			read_line = input_file.readline()
@@ -41,6 +43,9 @@ class PmbusCommandTable:
 	def get_file_path(self):
 		return self.file_path
 
+	def get_commands(self):
+		return list(self.command_list)
+
 	def __getitem__(self, key):
 		try:
 			command = self.command_table[key]
@@ -48,9 +53,21 @@ class PmbusCommandTable:
 			raise PmbusCommandTableCommandDNE(key, self.get_file_path())
 		return command
 
+loaded_command_tables = dict()
+
+def load_pmbus_command_table(file_path):
+	"""
+	Returns the command table for file_path, parsing the
+	file only the first time it is requested; tables are
+	read-only so devices of the same type share one
+	"""
+	if file_path not in loaded_command_tables:
+		loaded_command_tables.update({file_path : PmbusCommandTable(file_path)})
+	return loaded_command_tables[file_path]
+
 class PmbusCommandBaseError(Exception):
 	def __init__(self, error_message):
-		super().__init__(error_mesage)
+		super().__init__(error_message)
 		self.error_message = error_message
 
 class PmbusCommandInvalidBooleanParameterError(PmbusCommandBaseError):
@@ -105,6 +122,9 @@ class PmbusCommand:
 	def get_command_address_int(self):
 		return self.command_address_int
 
+	def get_command_address(self):
+		return byte_conversion.convert_signed_byte_to_unsigned_byte(self.command_address_int)
+
 	def get_command_address_hex(self):
 		return self.command_address_hex
 
@@ -1,8 +1,10 @@
-from smbus2 import SMBus
 from argparse import ArgumentParser
+import os
+import time
 
-from pmbus_devices import *
-from pmbus_command_table import *
+# smbus2, bitstring, the device modules and the per-command modules are
+# imported inside the methods that need them to keep one-shot startup fast
+from pmbus_device_manifest import *
 import byte_conversion
 
 class Q48SC12050CLInstructionsBaseError(Exception):
@@ -18,6 +20,10 @@ class Q48SC12050CLInstructionsDeviceAddressAlreadyExists(Q48SC12050CLInstruction
 	def __init__(self, device_address):
 		super().__init__(f"Device with address {device_address} is already configured")
 
+class Q48SC12050CLInstructionsInvalidSmbusNumber(Q48SC12050CLInstructionsBaseError):
+	def __init__(self, smbus_number):
+		super().__init__(f"{smbus_number} is not a valid SMBus number; must be 0 or 1")
+
 class Q48SC12050CLInstructionsInvalidPowerBrickSelection(Q48SC12050CLInstructionsBaseError):
 	pass
 
@@ -33,15 +39,35 @@ class Q48SC12050CLInstructionsInvalidDeviceType(Q48SC12050CLInstructionsInvalidP
 	def __init__(self, user_selected_device_type):
 		super().__init__(f"{user_selected_device_type} is not a valid device type")
 
+class Q48SC12050CLInstructionsInvalidCommandTableFile(Q48SC12050CLInstructionsBaseError):
+	def __init__(self, file_path):
+		super().__init__(f"{file_path} is not a command table file")
+
+class Q48SC12050CLInstructionsPowerBrickUnavailable(Q48SC12050CLInstructionsBaseError):
+	def __init__(self, device_address, err):
+		super().__init__(f"Power brick {hex(device_address)} could not be set up: {err}")
+
+class Q48SC12050CLInstructionsInvalidWriteValue(Q48SC12050CLInstructionsBaseError):
+	def __init__(self, command_name):
+		super().__init__(f"{command_name} is not a linear command; pass its bytes with -b instead of a value")
+
 class PmbusCommunicationsCLI:
 
 	DEVICE_ADDRESS_INDEX = 0
 	POWER_BRICK_INSTANCE_INDEX = 1
+	POWER_BRICK_SPEC_INDEX = 2
 	GENERAL_PMBUS_DEVICE_NAME = "other"
 
-	def __init__(self):
+
+	def __init__(self, record_directory=None, replay_directory=None, replay_time_scale=1.0):
 		self.num_power_bricks_configured = 0
-		self.power_bricks_list = [[], []]
+		# Power brick instances stay None until a command first uses them; see get_power_brick_instance
+		self.power_bricks_list = [[], [], []]
+		self.smbus_instances = dict()
+		self.record_directory = record_directory
+		self.replay_directory = replay_directory
+		self.replay_time_scale = replay_time_scale
+		self.device_manifest = PmbusDeviceManifest()
 
 	def evoke_device_configuration_prompt(self):
 		self.configure_initial_num_pmbus_devices()
@@ -61,14 +87,14 @@ class PmbusCommunicationsCLI:
 	def configure_initial_pmbus_devices(self):
 		self.configure_pmbus_devices()
 		for i in range(self.num_power_bricks_configured):
-			device_class = prompt_and_get_pmbus_device_type(i)
-			if device_class == PmbusDevice:
-				command_table = prompt_and_get_command_table(i)
+			device_type_name = self.prompt_and_get_pmbus_device_type(i)
+			if device_type_name == PmbusCommunicationsCLI.GENERAL_PMBUS_DEVICE_NAME:
+				command_table_file_path = self.prompt_and_get_command_table(i)
 			else:
-				command_table = None
-			device_address = prompt_and_get_device_address(i)
-			smbus_instance = prompt_and_get_smbus_instance(i)
-			self.add_pmbus_device(device_class, device_address, smbus_instance, command_table)
+				command_table_file_path = None
+			device_address = self.prompt_and_get_device_address(i)
+			smbus_number = self.prompt_and_get_smbus_number(i)
+			self.add_pmbus_device(device_type_name, device_address, smbus_number, command_table_file_path)
 
 	def prompt_and_get_device_address(self, device_index):
 		prompt = f"PMBus Device #{device_index} Address:"
@@ -88,29 +114,50 @@ class PmbusCommunicationsCLI:
 		prompt += PmbusCommunicationsCLI.GENERAL_PMBUS_DEVICE_NAME + "\n"
 		def try_statement_function():
 			user_selected_device_type = str(input())
-			device_class = self.get_pmbus_device_class(user_selected_device_type)
-			return device_class
-		device_class = self.prompt_and_get(prompt, try_statement_function)
-		return device_class
+			self.verify_pmbus_device_type(user_selected_device_type)
+			return user_selected_device_type
+		device_type_name = self.prompt_and_get(prompt, try_statement_function)
+		return device_type_name
 
 	def prompt_and_get_command_table(self, device_index):
 		prompt = f"PMBus Device #{device_index} Command Table File Path: "
 		def try_statement_function():
+			# The table is parsed when the power brick is first used
 			user_selected_command_table = str(input())
-			command_table = PmbusCommandTable(user_selected_command_table)
-			return command_table
-		command_table = self.prompt_and_get(prompt, try_statement_function)
-		return command_table
+			if not os.path.isfile(user_selected_command_table):
+				raise Q48SC12050CLInstructionsInvalidCommandTableFile(user_selected_command_table)
+			return user_selected_command_table
+		command_table_file_path = self.prompt_and_get(prompt, try_statement_function)
+		return command_table_file_path
 
-	def prompt_and_get_smbus_instance(self, device_index):
+	def prompt_and_get_smbus_number(self, device_index):
 		prompt = f"PMBus Device #{device_index} SMBus Number: "
 		def try_statement_function():
 			smbus_number = int(input())
 			self.verify_smbus_number(smbus_number)
-			smbus_instance = SMBus(smbus_number)
-			return smbus_instance
-		smbus_instance = self.prompt_and_get(prompt, try_statement_function)
-		return smbus_instance
+			return smbus_number
+		smbus_number = self.prompt_and_get(prompt, try_statement_function)
+		return smbus_number
+
+	def get_smbus_factory(self):
+		from pmbus_transaction_recording import PmbusSmbusFactory, PmbusRecordingSmbusFactory, PmbusReplaySmbusFactory
+
+		if self.replay_directory != None:
+			return PmbusReplaySmbusFactory(self.replay_directory, self.replay_time_scale)
+		if self.record_directory != None:
+			return PmbusRecordingSmbusFactory(self.record_directory)
+		return PmbusSmbusFactory()
+
+	def get_smbus_instance(self, smbus_number):
+		# One handle per bus so a recording holds the whole session for that bus
+		if smbus_number not in self.smbus_instances:
+			self.smbus_instances.update({smbus_number : self.get_smbus_factory()(smbus_number)})
+		return self.smbus_instances[smbus_number]
+
+	def close_smbus_instances(self):
+		for smbus_instance in self.smbus_instances.values():
+			smbus_instance.close()
+		self.smbus_instances = dict()
 
 	def prompt_and_get(self, prompt, try_statement_function):
 		is_valid = False
@@ -126,39 +173,69 @@ class PmbusCommunicationsCLI:
 		return value
 
 	def configure_pmbus_devices(self):
+		# Device types come from the cached manifest; classes are imported on first use
 		self.pmbus_devices_dict = dict()
-		for pmbus_device_class in PmbusDevice.__subclasses__():
-			class_name = pmbus_device_class.__name__
-			pmbus_devices_dict.update({class_name : pmbus_device_class})
+		for class_name in self.device_manifest.get_device_type_names():
+			self.pmbus_devices_dict.update({class_name : None})
+
+	def verify_pmbus_device_type(self, device_type_name):
+		if (device_type_name not in self.pmbus_devices_dict) and (device_type_name != PmbusCommunicationsCLI.GENERAL_PMBUS_DEVICE_NAME):
+			raise Q48SC12050CLInstructionsInvalidDeviceType(device_type_name)
 
 	def get_pmbus_device_class(self, class_name):
 		if class_name == PmbusCommunicationsCLI.GENERAL_PMBUS_DEVICE_NAME:
+			from pmbus_devices import PmbusDevice
 			device_class = PmbusDevice
 		else:
 			try:
-				device_class = self.pmbus_devices_dict[class_name]
+				device_class = self.device_manifest.get_device_class(class_name)
 			except:
 				raise Q48SC12050CLInstructionsInvalidDeviceType(class_name)
 		return device_class
 
-	def add_pmbus_device(self, device_class, device_address, smbus_instance, command_table):
-		if command_table == None:
-			pmbus_device = device_class(device_address, smbus_instance)
-		else:
-			pmbus_device = device_class(device_address, smbus_instance, command_table)
+	def add_pmbus_device(self, device_type_name, device_address, smbus_number, command_table_file_path=None):
+		self.verify_pmbus_device_type(device_type_name)
+		self.power_bricks_list[PmbusCommunicationsCLI.DEVICE_ADDRESS_INDEX].append(device_address)
+		self.power_bricks_list[PmbusCommunicationsCLI.POWER_BRICK_INSTANCE_INDEX].append(None)
+		self.power_bricks_list[PmbusCommunicationsCLI.POWER_BRICK_SPEC_INDEX].append((device_type_name, smbus_number, command_table_file_path))
+
+	def get_power_brick_instance(self, index):
+		# Building a device imports the device modules and opens its bus, so it waits for the first command that needs it
+		power_brick_instance = self.power_bricks_list[PmbusCommunicationsCLI.POWER_BRICK_INSTANCE_INDEX][index]
+		if power_brick_instance == None:
+			device_address = self.power_bricks_list[PmbusCommunicationsCLI.DEVICE_ADDRESS_INDEX][index]
+			device_type_name, smbus_number, command_table_file_path = self.power_bricks_list[PmbusCommunicationsCLI.POWER_BRICK_SPEC_INDEX][index]
+			try:
+				power_brick_instance = self.create_power_brick_instance(device_type_name, device_address, smbus_number, command_table_file_path)
+			except Q48SC12050CLInstructionsBaseError:
+				raise
+			except Exception as err:
+				raise Q48SC12050CLInstructionsPowerBrickUnavailable(device_address, err)
+			self.power_bricks_list[PmbusCommunicationsCLI.POWER_BRICK_INSTANCE_INDEX][index] = power_brick_instance
+		return power_brick_instance
+
+	def create_power_brick_instance(self, device_type_name, device_address, smbus_number, command_table_file_path):
+		device_class = self.get_pmbus_device_class(device_type_name)
+		smbus_instance = self.get_smbus_instance(smbus_number)
+		if command_table_file_path == None:
+			return device_class(device_address, smbus_instance)
+
+		from pmbus_command_table import load_pmbus_command_table
+		return device_class(device_address, smbus_instance, load_pmbus_command_table(command_table_file_path))
 
-		self.power_bricks_list[Q48SC12050CLInstructions.DEVICE_ADDRESS_INDEX].append(device_address)
-		self.power_bricks_list[Q48SC12050CLInstructions.POWER_BRICK_INSTANCE_INDEX].append(pmbus_device)
+	def get_power_brick_spec(self, index):
+		return self.power_bricks_list[PmbusCommunicationsCLI.POWER_BRICK_SPEC_INDEX][index]
 
 	def delete_power_brick(self, device_address):
-		if device_address in self.power_bricks_list[Q48SC12050CLInstructions.DEVICE_ADDRESS_INDEX]:
-			index = self.power_bricks_list[Q48SC12050CLInstructions.DEVICE_ADDRESS_INDEX].index(device_address)
-			self.power_bricks_list[Q48SC12050CLInstructions.DEVICE_ADDRESS_INDEX].pop(index)
-			self.power_bricks_list[Q48SC12050CLInstructions.POWER_BRICK_INSTANCE_INDEX].pop(index)
+		if device_address in self.power_bricks_list[PmbusCommunicationsCLI.DEVICE_ADDRESS_INDEX]:
+			index = self.power_bricks_list[PmbusCommunicationsCLI.DEVICE_ADDRESS_INDEX].index(device_address)
+			self.power_bricks_list[PmbusCommunicationsCLI.DEVICE_ADDRESS_INDEX].pop(index)
+			self.power_bricks_list[PmbusCommunicationsCLI.POWER_BRICK_INSTANCE_INDEX].pop(index)
+			self.power_bricks_list[PmbusCommunicationsCLI.POWER_BRICK_SPEC_INDEX].pop(index)
 
 	def verify_smbus_number(self, smbus_number):
-		if (smbus_number != 0) and (smbus_number != 1)
-			# Raise Error
+		if (smbus_number != 0) and (smbus_number != 1):
+			raise Q48SC12050CLInstructionsInvalidSmbusNumber(smbus_number)
 
 	def verify_device_address(self, device_address):
 		# SMBus Device Addresses are 7-bits
@@ -166,7 +243,7 @@ class PmbusCommunicationsCLI:
 			raise Q48SC12050CLInstructionsInvalidDeviceAddressInput(device_address)
 
 	def check_unique_device_address(self, device_address):
-		if device_address in list(self.power_bricks_dict):
+		if device_address in self.power_bricks_list[PmbusCommunicationsCLI.DEVICE_ADDRESS_INDEX]:
 			raise Q48SC12050CLInstructionsDeviceAddressAlreadyExists(device_address)
 
 	def execute_instruction(self, command, command_arguments):
@@ -174,54 +251,112 @@ class PmbusCommunicationsCLI:
 			self.execute_write_command(command_arguments)
 		elif command == "read":
 			self.execute_read_command(command_arguments)
+		elif command == "snapshot":
+			self.execute_snapshot_command(command_arguments)
+		elif command == "diff":
+			self.execute_diff_command(command_arguments)
+		elif command == "apply":
+			self.execute_apply_command(command_arguments)
+		elif command == "poll":
+			self.execute_poll_command(command_arguments)
+		elif command == "monitor":
+			self.execute_monitor_command(command_arguments)
 		else:
 			pass
 			# Invalid Command
 
-	def get_power_brick_from_index(self, index):
-		try:
-			power_brick = self.power_bricks_list[Q48SC12050CLInstructions.POWER_BRICK_INSTANCE_INDEX][arguments.index]
-		except:
+	def verify_power_brick_index(self, index):
+		if not (0 <= index < len(self.power_bricks_list[PmbusCommunicationsCLI.DEVICE_ADDRESS_INDEX])):
 			raise Q48SC12050CLInstructionsInvalidPowerBrickIndexSelection(index, self.num_power_bricks_configured)
-		return power_brick
 
-	def get_power_brick_from_address(self, device_address):
+	def get_power_brick_index_from_address(self, device_address):
 		try:
-			index = self.power_bricks_list[Q48SC12050CLInstructions.DEVICE_ADDRESS_INDEX].index(device_address)
-			power_brick = self.power_bricks_list[Q48SC12050CLInstructions.POWER_BRICK_INSTANCE_INDEX][index]
+			index = self.power_bricks_list[PmbusCommunicationsCLI.DEVICE_ADDRESS_INDEX].index(device_address)
 		except:
-			raise Q48SC12050CLInstructionsInvalidPowerBrickDeviceAddressSelection(device_address, self.power_bricks_list[Q48SC12050CLInstructions.DEVICE_ADDRESS_INDEX])
-		return power_brick
+			raise Q48SC12050CLInstructionsInvalidPowerBrickDeviceAddressSelection(device_address, self.power_bricks_list[PmbusCommunicationsCLI.DEVICE_ADDRESS_INDEX])
+		return index
+
+	def get_power_brick_from_index(self, index):
+		self.verify_power_brick_index(index)
+		return self.get_power_brick_instance(index)
+
+	def get_power_brick_from_address(self, device_address):
+		return self.get_power_brick_instance(self.get_power_brick_index_from_address(device_address))
 
 	def select_power_brick(self, index, device_address):
 		if index != None:
 			power_brick_instance = self.get_power_brick_from_index(index)
-		elif address != None:
-			device_address_int = self.convert_address_string_to_int(address)
+		elif device_address != None:
+			device_address_int = byte_conversion.convert_byte_string_to_int(device_address)
 			self.verify_device_address(device_address_int)
 			power_brick_instance = self.get_power_brick_from_address(device_address_int)
 		return power_brick_instance
 
+	def select_power_bricks(self, index, device_address):
+		return [self.get_power_brick_instance(selected_index) for selected_index in self.select_power_brick_indexes(index, device_address)]
+
+	def select_power_brick_indexes(self, index, device_address):
+		# Selects without building the power bricks, for commands that hand them to worker processes
+		if (index == None) and (device_address == None):
+			return list(range(len(self.power_bricks_list[PmbusCommunicationsCLI.DEVICE_ADDRESS_INDEX])))
+		if index != None:
+			self.verify_power_brick_index(index)
+			return [index]
+		device_address_int = byte_conversion.convert_byte_string_to_int(device_address)
+		self.verify_device_address(device_address_int)
+		return [self.get_power_brick_index_from_address(device_address_int)]
+
 	def get_command(self, command):
+		# Command addresses are looked up by the same signed int the command table is keyed on
 		try:
-			new_command = self.convert_address_string_to_int(command)
-		except:
+			new_command = byte_conversion.convert_byte_string_to_int(command)
+		except byte_conversion.ByteConversionBaseError:
 			new_command = command
 		return new_command
 
-	def get_bytes_to_write(self, value, bytes_read, command_table_entry):
-		if value != None
-			if command_table_entry.is_linear_data_format():
-				bytes_to_write = Q48SC12050.get_linear_write_bytes(command_table_entry, value)
-			else:
-				pass
-				# Error
-		elif bytes_read != None:
-			bytes_to_write = copy.copy(bytes_read.reverse())
+	def get_bytes_to_write(self, power_brick_instance, value, byte_strings, command_table_entry):
+		if value != None:
+			if not command_table_entry.is_linear_data_format():
+				raise Q48SC12050CLInstructionsInvalidWriteValue(command_table_entry.get_command_name())
+			bytes_to_write = power_brick_instance.get_linear_write_bytes(command_table_entry, value)
+		elif byte_strings != None:
+			# Bytes are given MSByte first and sent LSByte first
+			bytes_to_write = [byte_conversion.convert_signed_byte_to_unsigned_byte(byte_conversion.convert_byte_string_to_int(byte_string)) for byte_string in reversed(byte_strings)]
+		else:
+			bytes_to_write = []
 		return bytes_to_write
 
+	def execute_read_command(self, command_arguments):
+		read_parser = ArgumentParser(prog="read")
+
+		read_parser.add_argument("command", help="PMBus Command to read from Power Brick; text or address")
+
+		power_brick_selection_group = read_parser.add_mutually_exclusive_group(required=True)
+		power_brick_selection_group.add_argument("-i", "--index", type=int, help="Specifies power brick index to read from")
+		power_brick_selection_group.add_argument("-a", "--address", help="Specifies power brick device address to read from")
+
+		arguments = read_parser.parse_args(command_arguments)
+
+		from pmbus_devices import PmbusDeviceBaseError, PmbusCommandTableBaseError
+		from pmbus_transaction_recording import PmbusTransactionRecordingBaseError
+
+		command = self.get_command(arguments.command)
+
+		try:
+			power_brick_instance = self.select_power_brick(arguments.index, arguments.address)
+			command_table_entry = power_brick_instance.get_command_table_entry(command)
+			bytes_read = power_brick_instance.read_bytes(command)
+		except (Q48SC12050CLInstructionsBaseError, PmbusDeviceBaseError, PmbusCommandTableBaseError, PmbusTransactionRecordingBaseError, OSError) as err:
+			print(err)
+			return
+
+		if command_table_entry.is_linear_data_format():
+			print(power_brick_instance.get_linear_read_value(command_table_entry, bytes_read))
+		else:
+			print(" ".join(f"0x{byte_int:02X}" for byte_int in bytes_read))
+
 	def execute_write_command(self, command_arguments):
-		write_parser = ArgumentParser()
+		write_parser = ArgumentParser(prog="write")
 
 		write_parser.add_argument("command", help="PMBus Command to write to Power Brick; text or address")
 
@@ -234,52 +369,273 @@ class PmbusCommunicationsCLI:
 		data_group.add_argument("-b", "--bytes", nargs="+", help="List of Bytes (Hex, Binary, Decimal) to send with PMBus Command with MSByte First")
 
 		consecutive_write_group = write_parser.add_mutually_exclusive_group()
-		consecutive_write_group.add_argument("-l", "--loops", type=int, help="Number of consecutive write commands to execute")
+		consecutive_write_group.add_argument("-l", "--loops", type=int, default=1, help="Number of consecutive write commands to execute")
 		consecutive_write_group.add_argument("-t", "--time", type=int, help="Number of milliseconds to continuously send write command for")
 
+		write_parser.add_argument("--verify", action="store_true", help="Read the register back after the last write and report whether it took")
+
 		arguments = write_parser.parse_args(command_arguments)
 
-		command = get_command(arguments.command)
+		from pmbus_verification import PmbusVerifiedWriter, PmbusDeviceBaseError, PmbusCommandTableBaseError
+		from pmbus_transaction_recording import PmbusTransactionRecordingBaseError
+
+		command = self.get_command(arguments.command)
+
+		try:
+			power_brick_instance = self.select_power_brick(arguments.index, arguments.address)
+			command_table_entry = power_brick_instance.get_command_table_entry(command)
+			bytes_to_write = self.get_bytes_to_write(power_brick_instance, arguments.value, arguments.bytes, command_table_entry)
+		except (Q48SC12050CLInstructionsBaseError, PmbusDeviceBaseError, PmbusCommandTableBaseError, byte_conversion.ByteConversionBaseError) as err:
+			print(err)
+			return
+
+		# With --verify the final write goes through the verified writer so it is read back
+		num_unverified_writes = arguments.loops - 1 if arguments.verify else arguments.loops
+		try:
+			if arguments.time != None:
+				end_time = time.monotonic() + (arguments.time / 1000)
+				while time.monotonic() < end_time:
+					power_brick_instance.write_bytes(command, bytes_to_write)
+			else:
+				for i in range(num_unverified_writes):
+					power_brick_instance.write_bytes(command, bytes_to_write)
+
+			if arguments.verify:
+				verified_writer = PmbusVerifiedWriter()
+				verified_writer.queue_write(power_brick_instance, command, bytes_to_write)
+				print(verified_writer.execute())
+		except (PmbusDeviceBaseError, PmbusCommandTableBaseError, PmbusTransactionRecordingBaseError, OSError) as err:
+			print(err)
+
+	def add_power_brick_selection_arguments(self, parser):
+		power_brick_selection_group = parser.add_mutually_exclusive_group()
+		power_brick_selection_group.add_argument("-i", "--index", type=int, help="Specifies power brick index; all power bricks if omitted")
+		power_brick_selection_group.add_argument("-a", "--address", help="Specifies power brick device address; all power bricks if omitted")
+
+	def execute_snapshot_command(self, command_arguments):
+		snapshot_parser = ArgumentParser(prog="snapshot")
+		self.add_power_brick_selection_arguments(snapshot_parser)
+		snapshot_parser.add_argument("-o", "--output", help="Directory to save one profile file per power brick to")
+		snapshot_parser.add_argument("--include-operational", action="store_true", help="Also capture OPERATION, VOUT_COMMAND and VOUT_MARGIN_* setpoints")
+
+		arguments = snapshot_parser.parse_args(command_arguments)
 
 		try:
-			power_brick_instance =  self.select_power_brick(arguments.index, arguments.address)
+			power_brick_instances = self.select_power_bricks(arguments.index, arguments.address)
 		except Q48SC12050CLInstructionsBaseError as err:
 			print(err.error_message)
 			return
 
+		from pmbus_configuration import PmbusConfigurationTool, PmbusDeviceBaseError
+		from pmbus_transaction_recording import PmbusTransactionRecordingBaseError
+
+		configuration_tool = PmbusConfigurationTool()
+		for power_brick_instance in power_brick_instances:
+			device_address = power_brick_instance.get_device_address()
+			try:
+				snapshot = configuration_tool.snapshot_device(power_brick_instance, include_operational=arguments.include_operational)
+			except (PmbusDeviceBaseError, PmbusTransactionRecordingBaseError, OSError) as err:
+				print(f"{hex(device_address)}: {err}")
+				continue
+
+			if arguments.output != None:
+				try:
+					snapshot.save_profile(f"{arguments.output}/{hex(device_address)}.csv")
+				except OSError as err:
+					print(f"{hex(device_address)}: {err}")
+			else:
+				for command_name in snapshot.get_command_names():
+					print(f"{hex(device_address)} {command_name}: {snapshot.get_value(command_name)}")
+
+	def execute_diff_command(self, command_arguments):
+		diff_parser = ArgumentParser(prog="diff")
+		diff_parser.add_argument("profile", help="Golden profile file path")
+		self.add_power_brick_selection_arguments(diff_parser)
+
+		arguments = diff_parser.parse_args(command_arguments)
+		def diff_function(configuration_tool, power_brick_instance, golden_profile):
+			return configuration_tool.diff_device(power_brick_instance, golden_profile)
+		self.execute_configuration_command(arguments, diff_function)
+
+	def execute_apply_command(self, command_arguments):
+		apply_parser = ArgumentParser(prog="apply")
+		apply_parser.add_argument("profile", help="Golden profile file path")
+		self.add_power_brick_selection_arguments(apply_parser)
+		apply_parser.add_argument("--no-store", action="store_true", help="Do not issue STORE_DEFAULT_ALL after writing")
+		apply_parser.add_argument("--verify", action="store_true", help="Read back every written register and report mismatches")
+
+		arguments = apply_parser.parse_args(command_arguments)
+		if arguments.verify:
+			self.execute_verified_apply_command(arguments)
+			return
+
+		def apply_function(configuration_tool, power_brick_instance, golden_profile):
+			return configuration_tool.apply_device(power_brick_instance, golden_profile, not arguments.no_store)
+		self.execute_configuration_command(arguments, apply_function)
+
+	def execute_verified_apply_command(self, arguments):
+		from pmbus_configuration import PmbusConfigurationTool, PmbusConfigurationBaseError, PmbusDeviceBaseError, PmbusCommandTableBaseError
+		from pmbus_transaction_recording import PmbusTransactionRecordingBaseError
+
 		try:
-			command_table_entry = power_brick_instance.get_command_table_entry(command)
-		except Q48SC12050PmbusCommandTableBaseError as err:
-			print(err.error_message)
+			power_brick_instances = self.select_power_bricks(arguments.index, arguments.address)
+			golden_profile = self.load_golden_profile(arguments.profile, power_brick_instances)
+		except (Q48SC12050CLInstructionsBaseError, PmbusConfigurationBaseError, OSError) as err:
+			print(err)
 			return
 
-		bytes_to_write = self.get_bytes_to_write(arguments.value, arguments.bytes_read, command_table_entry)
-		power_brick_instance.write_data(command_table_entry, bytes_to_write)
-			
+		configuration_tool = PmbusConfigurationTool()
+		try:
+			fleet_differences, report = configuration_tool.apply_fleet_verified(power_brick_instances, golden_profile, not arguments.no_store)
+		except (PmbusConfigurationBaseError, PmbusDeviceBaseError, PmbusCommandTableBaseError, PmbusTransactionRecordingBaseError, OSError) as err:
+			print(err)
+			return
 
-if __name__ == "__main__":
-	#i2c_bus_num = 1;
-	#smbus_instance = SMBus(i2c_bus_num)
-	#smbus_instance.enable_pec(True)
-	smbus_instance = None
+		for power_brick_instance, differences in fleet_differences:
+			if len(differences) == 0:
+				print(f"{hex(power_brick_instance.get_device_address())}: matches {golden_profile.get_file_path()}")
+		for verified_write in report.get_results():
+			print(verified_write)
 
-	table_input_file = "Q48SC12050_PMBus_Commands.csv"
-	command_table = Q48SC12050PmbusCommandTable(table_input_file)
-	
-	# power_brick1 = Q48SC12050(0x7F, smbus_instance, command_table)
-	# power_brick2 = Q48SC12050(0x23, smbus_instance, command_table)
+	def execute_poll_command(self, command_arguments):
+		from pmbus_adaptive_polling import PmbusAdaptivePoller, PmbusAdaptivePollingBaseError, PmbusAdaptivePollerNoChannels, PmbusDeviceBaseError, PmbusCommandTableBaseError
+		from pmbus_transaction_recording import PmbusTransactionRecordingBaseError
 
-	terminal = Q48SC12050CLInstructions(smbus_instance, command_table)
-	#terminal.evoke_device_configuration_prompt()
+		poll_parser = ArgumentParser(prog="poll")
+		self.add_power_brick_selection_arguments(poll_parser)
+		poll_parser.add_argument("-c", "--commands", nargs="+", default=PmbusAdaptivePoller.DEFAULT_COMMAND_NAMES, help="PMBus Commands to poll")
+		poll_parser.add_argument("-t", "--time", type=float, help="Number of seconds to poll for; polls until interrupted if omitted")
+		poll_parser.add_argument("--min-period", type=float, default=PmbusAdaptivePoller.DEFAULT_MIN_PERIOD, help="Fastest poll period in seconds")
+		poll_parser.add_argument("--max-period", type=float, default=PmbusAdaptivePoller.DEFAULT_MAX_PERIOD, help="Slowest poll period in seconds for a quiet channel")
+		poll_parser.add_argument("--status-max-period", type=float, default=PmbusAdaptivePoller.DEFAULT_STATUS_MAX_PERIOD, help="Slowest poll period in seconds for each power brick's STATUS_WORD")
+		poll_parser.add_argument("--deadband-lsbs", type=int, default=PmbusAdaptivePoller.DEFAULT_DEADBAND_NUM_LSBS, help="Deadband in multiples of each command's resolution")
 
-	#command_list = ["write", "read", "listc", "plot", "help", "trans", "addpb", "deletepb", "listpb", "exit", "pec"]
+		arguments = poll_parser.parse_args(command_arguments)
+
+		try:
+			adaptive_poller = PmbusAdaptivePoller(arguments.min_period, arguments.max_period, deadband_num_lsbs=arguments.deadband_lsbs, status_max_period=arguments.status_max_period)
+			for power_brick_instance in self.select_power_bricks(arguments.index, arguments.address):
+				adaptive_poller.add_device(power_brick_instance, arguments.commands)
+		except (Q48SC12050CLInstructionsBaseError, PmbusAdaptivePollingBaseError, PmbusDeviceBaseError, PmbusCommandTableBaseError) as err:
+			print(err)
+			return
+
+		def print_poll_event(event):
+			# A recording that cannot serve the poll would otherwise report an error every cycle
+			if isinstance(event.get_error(), PmbusTransactionRecordingBaseError):
+				raise event.get_error()
+			print(event)
+
+		try:
+			adaptive_poller.run(print_poll_event, arguments.time)
+		except PmbusAdaptivePollerNoChannels:
+			print("No power bricks to poll; add one before polling")
+		except PmbusTransactionRecordingBaseError as err:
+			print(err)
+		except KeyboardInterrupt:
+			pass
+
+	def execute_monitor_command(self, command_arguments):
+		from pmbus_bus_workers import PmbusBusWorkerPool, PmbusBusWorkerBaseError, PmbusDeviceBaseError, PmbusCommandTableBaseError
 
-	#parser = ArgumentParser()
-	#parser.add_argument("command", choices=command_list, help="Select Q48SC12050 power supply control command")
+		monitor_parser = ArgumentParser(prog="monitor")
+		self.add_power_brick_selection_arguments(monitor_parser)
+		monitor_parser.add_argument("-c", "--commands", nargs="+", default=PmbusBusWorkerPool.DEFAULT_COMMAND_NAMES, help="PMBus Commands to read every sweep")
+		monitor_parser.add_argument("-t", "--time", type=float, help="Number of seconds to monitor for; monitors until interrupted if omitted")
+		monitor_parser.add_argument("-p", "--period", type=float, default=PmbusBusWorkerPool.DEFAULT_POLL_PERIOD, help="Sweep period in seconds for each bus")
 
+		arguments = monitor_parser.parse_args(command_arguments)
 
+		# One worker process per SMBus; each opens its own handle through the same factory as the CLI
+		bus_worker_pool = PmbusBusWorkerPool(arguments.commands, arguments.period, self.get_smbus_factory())
+		try:
+			for index in self.select_power_brick_indexes(arguments.index, arguments.address):
+				device_type_name, smbus_number, command_table_file_path = self.get_power_brick_spec(index)
+				device_address = self.power_bricks_list[PmbusCommunicationsCLI.DEVICE_ADDRESS_INDEX][index]
+				bus_worker_pool.add_device(smbus_number, device_type_name, device_address, command_table_file_path)
+		except (Q48SC12050CLInstructionsBaseError, PmbusBusWorkerBaseError, PmbusDeviceBaseError, PmbusCommandTableBaseError, OSError) as err:
+			print(err)
+			return
+
+		if len(bus_worker_pool.get_bus_numbers()) == 0:
+			print("No power bricks to monitor; add one before monitoring")
+			return
+
+		try:
+			bus_worker_pool.start()
+		except (PmbusDeviceBaseError, PmbusCommandTableBaseError) as err:
+			# Workers for buses set up before the failing one are already running
+			bus_worker_pool.stop()
+			print(err)
+			return
+
+		end_time = None if arguments.time == None else time.monotonic() + arguments.time
+		printed_sweep_counts = dict()
+		try:
+			while (end_time == None) or (time.monotonic() < end_time):
+				time.sleep(arguments.period)
+				sweep_counts = bus_worker_pool.get_sweep_counts()
+				# Wait for the first sweep on every bus, then print whenever any bus has swept again
+				if (min(sweep_counts.values()) == 0) or (sweep_counts == printed_sweep_counts):
+					continue
+				printed_sweep_counts = sweep_counts
+				for (smbus_number, device_address, command_name), value in bus_worker_pool.read_samples().items():
+					print(f"{time.time():.3f} SMBus {smbus_number} {hex(device_address)} {command_name}: {'read error' if value == None else value}")
+		except PmbusBusWorkerBaseError as err:
+			print(err)
+		except KeyboardInterrupt:
+			pass
+		finally:
+			bus_worker_pool.stop()
+
+	def load_golden_profile(self, profile_file_path, power_brick_instances):
+		from pmbus_configuration import PmbusConfigurationProfile
+
+		# Values are parsed against the selected power bricks' command table format
+		if len(power_brick_instances) == 0:
+			return PmbusConfigurationProfile(profile_file_path)
+		return PmbusConfigurationProfile(profile_file_path, power_brick_instances[0].command_table)
+
+	def execute_configuration_command(self, arguments, configuration_function):
+		from pmbus_configuration import PmbusConfigurationTool, PmbusConfigurationBaseError, PmbusDeviceBaseError, PmbusCommandTableBaseError
+		from pmbus_transaction_recording import PmbusTransactionRecordingBaseError
+
+		try:
+			power_brick_instances = self.select_power_bricks(arguments.index, arguments.address)
+			golden_profile = self.load_golden_profile(arguments.profile, power_brick_instances)
+		except (Q48SC12050CLInstructionsBaseError, PmbusConfigurationBaseError, OSError) as err:
+			print(err)
+			return
+
+		configuration_tool = PmbusConfigurationTool()
+		for power_brick_instance in power_brick_instances:
+			device_address = power_brick_instance.get_device_address()
+			try:
+				differences = configuration_function(configuration_tool, power_brick_instance, golden_profile)
+			except (PmbusConfigurationBaseError, PmbusDeviceBaseError, PmbusCommandTableBaseError, PmbusTransactionRecordingBaseError, OSError) as err:
+				print(f"{hex(device_address)}: {err}")
+				continue
+
+			if len(differences) == 0:
+				print(f"{hex(device_address)}: matches {golden_profile.get_file_path()}")
+			for difference in differences:
+				print(difference)
+			
+
+if __name__ == "__main__":
+	startup_parser = ArgumentParser()
+	startup_parser.add_argument("--record", help="Directory to record each SMBus session to")
+	startup_parser.add_argument("--replay", help="Directory of SMBus recordings to replay instead of using hardware")
+	startup_parser.add_argument("--time-scale", type=float, default=1.0, help="Replay timing relative to the recording; 0 replays as fast as possible")
+	startup_arguments = startup_parser.parse_args()
+
+	terminal = PmbusCommunicationsCLI(startup_arguments.record, startup_arguments.replay, startup_arguments.time_scale)
+	terminal.evoke_device_configuration_prompt()
+
+	#command_list = ["write", "read", "listc", "plot", "help", "trans", "addpb", "deletepb", "listpb", "exit", "pec"]
 
 	command_list = str(input()).split(" ")
 	command = command_list[0]
 	argument_list = command_list[1:]
-	terminal.execute_instruction(command, argument_list)
\ No newline at end of file
+	terminal.execute_instruction(command, argument_list)
+	terminal.close_smbus_instances()
@@ -0,0 +1,312 @@
+from pmbus_devices import *
+from pmbus_verification import *
+import byte_conversion
+
+class PmbusConfigurationBaseError(Exception):
+	def __init__(self, error_message):
+		super().__init__(error_message)
+		self.error_message = error_message
+
+class PmbusConfigurationInvalidProfileLine(PmbusConfigurationBaseError):
+	def __init__(self, line, file_path):
+		super().__init__(f"Invalid profile line \"{line}\" in {file_path}; expected Command Name,Value,Tolerance")
+
+class PmbusConfigurationInvalidProfileValue(PmbusConfigurationBaseError):
+	def __init__(self, command_name, value_string):
+		super().__init__(f"Invalid profile value {value_string} for {command_name} command")
+
+class PmbusConfigurationUnknownCommand(PmbusConfigurationBaseError):
+	def __init__(self, command_name, file_path):
+		super().__init__(f"{command_name} command in profile does not exist in table from {file_path}")
+
+class PmbusConfigurationCommandNotAccessible(PmbusConfigurationBaseError):
+	def __init__(self, command_name, access):
+		super().__init__(f"{command_name} command in profile is not {access} accessible")
+
+class PmbusConfigurationProfile:
+	"""
+	Configuration register values keyed by command name; linear
+	commands hold engineering unit values and all other commands
+	hold the list of data bytes in the order they are read. Given
+	a command table, values are parsed against each command's
+	format; without one, only hex or binary values are bytes
+	"""
+
+	TOTAL_NUM_PROFILE_PARAMETERS = 3
+
+	COMMAND_NAME_INDEX = 0
+	VALUE_INDEX = 1
+	TOLERANCE_INDEX = 2
+
+	HEADERS_LINE = "Command Name,Value,Tolerance"
+	BYTE_SEPARATOR = " "
+
+	def __init__(self, file_path=None, command_table=None):
+		self.profile_entries = dict()
+		self.file_path = file_path
+		self.command_table = command_table
+		if self.file_path != None:
+			self.load_profile()
+
+	def load_profile(self):
+		input_file = open(self.file_path, 'r')
+
+		# Read Headers Line
+		read_line = input_file.readline()
+
+		# Read Data Lines
+		read_line = input_file.readline()
+		while read_line != "":
+			read_line = read_line.rstrip("\n")
+			if read_line != "":
+				self.add_profile_line(read_line)
+			read_line = input_file.readline()
+
+		input_file.close()
+
+	def add_profile_line(self, read_line):
+		profile_data = read_line.split(",")
+		if len(profile_data) != PmbusConfigurationProfile.TOTAL_NUM_PROFILE_PARAMETERS:
+			raise PmbusConfigurationInvalidProfileLine(read_line, self.file_path)
+
+		command_name = profile_data[PmbusConfigurationProfile.COMMAND_NAME_INDEX]
+		value = self.parse_value(command_name, profile_data[PmbusConfigurationProfile.VALUE_INDEX])
+		tolerance_string = profile_data[PmbusConfigurationProfile.TOLERANCE_INDEX]
+		if tolerance_string == "":
+			tolerance = None
+		else:
+			tolerance = self.parse_float(command_name, tolerance_string)
+		self.set_entry(command_name, value, tolerance)
+
+	def parse_value(self, command_name, value_string):
+		if self.command_table != None:
+			return self.parse_value_for_command(command_name, value_string)
+		if value_string.startswith("0x") or value_string.startswith("0b") or (PmbusConfigurationProfile.BYTE_SEPARATOR in value_string):
+			return self.parse_bytes(command_name, value_string)
+		return self.parse_float(command_name, value_string)
+
+	def parse_value_for_command(self, command_name, value_string):
+		try:
+			command_entry = self.command_table[command_name]
+		except PmbusCommandTableBaseError:
+			raise PmbusConfigurationUnknownCommand(command_name, self.command_table.get_file_path())
+
+		if command_entry.is_linear_data_format():
+			return self.parse_float(command_name, value_string)
+		value = self.parse_bytes(command_name, value_string)
+		if len(value) != command_entry.get_num_data_bytes():
+			raise PmbusConfigurationInvalidProfileValue(command_name, value_string)
+		return value
+
+	def parse_bytes(self, command_name, value_string):
+		try:
+			return [byte_conversion.convert_signed_byte_to_unsigned_byte(byte_conversion.convert_byte_string_to_int(byte_string)) for byte_string in value_string.split(PmbusConfigurationProfile.BYTE_SEPARATOR)]
+		except byte_conversion.ByteConversionBaseError:
+			raise PmbusConfigurationInvalidProfileValue(command_name, value_string)
+
+	def parse_float(self, command_name, value_string):
+		try:
+			return float(value_string)
+		except ValueError:
+			raise PmbusConfigurationInvalidProfileValue(command_name, value_string)
+
+	def format_value(self, value):
+		if isinstance(value, list):
+			return PmbusConfigurationProfile.BYTE_SEPARATOR.join(f"0x{byte_int:02X}" for byte_int in value)
+		return repr(float(value))
+
+	def save_profile(self, file_path):
+		output_file = open(file_path, 'w')
+		output_file.write(PmbusConfigurationProfile.HEADERS_LINE + "\n")
+		for command_name, (value, tolerance) in self.profile_entries.items():
+			tolerance_string = "" if tolerance == None else repr(tolerance)
+			output_file.write(f"{command_name},{self.format_value(value)},{tolerance_string}\n")
+		output_file.close()
+		self.file_path = file_path
+
+	def set_entry(self, command_name, value, tolerance=None):
+		self.profile_entries.update({command_name : (value, tolerance)})
+
+	def get_command_names(self):
+		return list(self.profile_entries)
+
+	def get_value(self, command_name):
+		return self.profile_entries[command_name][0]
+
+	def get_tolerance(self, command_name):
+		return self.profile_entries[command_name][1]
+
+	def get_file_path(self):
+		return self.file_path
+
+	def __contains__(self, command_name):
+		return command_name in self.profile_entries
+
+class PmbusConfigurationDifference:
+
+	def __init__(self, device_address, command_name, expected_value, actual_value):
+		self.device_address = device_address
+		self.command_name = command_name
+		self.expected_value = expected_value
+		self.actual_value = actual_value
+
+	def get_device_address(self):
+		return self.device_address
+
+	def get_command_name(self):
+		return self.command_name
+
+	def get_expected_value(self):
+		return self.expected_value
+
+	def get_actual_value(self):
+		return self.actual_value
+
+	def __str__(self):
+		return f"{hex(self.device_address)} {self.command_name}: expected {self.expected_value}, read {self.actual_value}"
+
+class PmbusConfigurationTool:
+	"""
+	Snapshot, diff and minimal-write restore of configuration
+	registers; every register is read once per device per
+	operation and only differing registers are written
+	"""
+
+	STORE_DEFAULT_ALL_COMMAND_NAME = "STORE_DEFAULT_ALL"
+	STATUS_COMMAND_PREFIX = "STATUS_"
+
+	# Restoring these would switch outputs or move setpoints, not just limits
+	OPERATIONAL_COMMAND_NAMES = ["OPERATION", "VOUT_COMMAND", "VOUT_MARGIN_HIGH", "VOUT_MARGIN_LOW"]
+
+	def get_configuration_commands(self, device, include_operational=False):
+		configuration_commands = []
+		for command_entry in device.command_table.get_commands():
+			# STATUS registers are write-to-clear, not configuration
+			if command_entry.get_command_name().startswith(PmbusConfigurationTool.STATUS_COMMAND_PREFIX):
+				continue
+			if (not include_operational) and (command_entry.get_command_name() in PmbusConfigurationTool.OPERATIONAL_COMMAND_NAMES):
+				continue
+			if command_entry.is_read_enabled() and command_entry.is_write_enabled() and (command_entry.get_num_data_bytes() > 0):
+				configuration_commands.append(command_entry)
+		return configuration_commands
+
+	def read_value(self, device, command_entry):
+		bytes_read = device.read_bytes(command_entry.get_command_name())
+		if command_entry.is_linear_data_format():
+			return device.get_linear_read_value(command_entry, bytes_read)
+		return list(bytes_read)
+
+	def encode_value(self, device, command_entry, value):
+		if command_entry.is_linear_data_format():
+			return device.get_linear_write_bytes(command_entry, value)
+		return list(value)
+
+	def get_default_tolerance(self, command_entry):
+		# One LSB of the linear format absorbs encode/decode quantization
+		if command_entry.is_linear_data_format():
+			return 2 ** command_entry.get_exponent()
+		return 0
+
+	def is_within_tolerance(self, command_entry, expected_value, actual_value, tolerance):
+		if tolerance == None:
+			tolerance = self.get_default_tolerance(command_entry)
+		if command_entry.is_linear_data_format():
+			return abs(actual_value - expected_value) <= tolerance
+		return list(actual_value) == list(expected_value)
+
+	def verify_profile(self, device, golden_profile, require_write_enabled):
+		"""
+		Checks every profile entry against the device's command
+		table before any bus traffic, so a bad profile never leaves
+		a device partially applied
+		"""
+		for command_name in golden_profile.get_command_names():
+			try:
+				command_entry = device.get_command_table_entry(command_name)
+			except PmbusCommandTableBaseError:
+				raise PmbusConfigurationUnknownCommand(command_name, device.command_table.get_file_path())
+
+			if not command_entry.is_read_enabled():
+				raise PmbusConfigurationCommandNotAccessible(command_name, "read")
+			if require_write_enabled and (not command_entry.is_write_enabled()):
+				raise PmbusConfigurationCommandNotAccessible(command_name, "write")
+
+			value = golden_profile.get_value(command_name)
+			if command_entry.is_linear_data_format():
+				is_valid_value = isinstance(value, (int, float))
+			else:
+				is_valid_value = isinstance(value, list) and (len(value) == command_entry.get_num_data_bytes())
+			if not is_valid_value:
+				raise PmbusConfigurationInvalidProfileValue(command_name, value)
+
+	def snapshot_device(self, device, command_names=None, include_operational=False):
+		if command_names == None:
+			command_entries = self.get_configuration_commands(device, include_operational)
+		else:
+			command_entries = [device.get_command_table_entry(command_name) for command_name in command_names]
+
+		snapshot = PmbusConfigurationProfile()
+		for command_entry in command_entries:
+			snapshot.set_entry(command_entry.get_command_name(), self.read_value(device, command_entry))
+		return snapshot
+
+	def diff_device(self, device, golden_profile, snapshot=None):
+		self.verify_profile(device, golden_profile, False)
+		command_names = golden_profile.get_command_names()
+		if snapshot == None:
+			snapshot = self.snapshot_device(device, command_names)
+
+		differences = []
+		for command_name in command_names:
+			command_entry = device.get_command_table_entry(command_name)
+			expected_value = golden_profile.get_value(command_name)
+			actual_value = snapshot.get_value(command_name)
+			if not self.is_within_tolerance(command_entry, expected_value, actual_value, golden_profile.get_tolerance(command_name)):
+				differences.append(PmbusConfigurationDifference(device.get_device_address(), command_name, expected_value, actual_value))
+		return differences
+
+	def apply_device(self, device, golden_profile, store_default_all=True):
+		self.verify_profile(device, golden_profile, True)
+		differences = self.diff_device(device, golden_profile)
+		for difference in differences:
+			command_entry = device.get_command_table_entry(difference.get_command_name())
+			bytes_to_write = self.encode_value(device, command_entry, difference.get_expected_value())
+			device.write_bytes(difference.get_command_name(), bytes_to_write)
+
+		# Only commit to NVM once, and only when something changed
+		if store_default_all and (len(differences) > 0):
+			device.write_bytes(PmbusConfigurationTool.STORE_DEFAULT_ALL_COMMAND_NAME)
+		return differences
+
+	# Fleet results are (device, result) pairs in device order; the same
+	# device address may be in use on more than one SMBus bus
+	def snapshot_fleet(self, devices, command_names=None, include_operational=False):
+		return [(device, self.snapshot_device(device, command_names, include_operational)) for device in devices]
+
+	def diff_fleet(self, devices, golden_profile):
+		return [(device, self.diff_device(device, golden_profile)) for device in devices]
+
+	def apply_fleet(self, devices, golden_profile, store_default_all=True):
+		for device in devices:
+			self.verify_profile(device, golden_profile, True)
+		return [(device, self.apply_device(device, golden_profile, store_default_all)) for device in devices]
+
+	def apply_fleet_verified(self, devices, golden_profile, store_default_all=True):
+		for device in devices:
+			self.verify_profile(device, golden_profile, True)
+		fleet_differences = self.diff_fleet(devices, golden_profile)
+
+		verified_writer = PmbusVerifiedWriter()
+		for device, differences in fleet_differences:
+			for difference in differences:
+				command_entry = device.get_command_table_entry(difference.get_command_name())
+				bytes_to_write = self.encode_value(device, command_entry, difference.get_expected_value())
+				verified_writer.queue_write(device, difference.get_command_name(), bytes_to_write)
+		report = verified_writer.execute()
+
+		# Never commit a register that failed its readback to NVM
+		if store_default_all:
+			for device, differences in fleet_differences:
+				if (len(differences) > 0) and report.is_device_verified(device):
+					device.write_bytes(PmbusConfigurationTool.STORE_DEFAULT_ALL_COMMAND_NAME)
+		return fleet_differences, report
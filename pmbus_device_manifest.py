@@ -0,0 +1,110 @@
+import importlib
+import json
+import os
+
+class PmbusDeviceManifestBaseError(Exception):
+	def __init__(self, error_message):
+		super().__init__(error_message)
+		self.error_message = error_message
+
+class PmbusDeviceManifestInvalidDeviceType(PmbusDeviceManifestBaseError):
+	def __init__(self, device_type_name):
+		super().__init__(f"{device_type_name} is not a valid device type")
+
+class PmbusDeviceManifest:
+	"""
+	Cached list of the PmbusDevice subclasses and their command
+	table files, so startup can offer device types without
+	importing pmbus_devices; the cache is rebuilt whenever a
+	source module is newer than it
+	"""
+
+	DEFAULT_MANIFEST_FILE_PATH = "./PmbusCommandTables/device_manifest.json"
+	SOURCE_MODULE_NAMES = ["pmbus_devices", "pmbus_command_table"]
+
+	MODULE_KEY = "module"
+	COMMAND_TABLE_FILE_PATH_KEY = "command_table_file_path"
+	SOURCE_MTIMES_KEY = "source_mtimes"
+	DEVICE_TYPES_KEY = "device_types"
+
+	def __init__(self, manifest_file_path=DEFAULT_MANIFEST_FILE_PATH):
+		self.manifest_file_path = manifest_file_path
+		self.device_types = None
+
+	def get_manifest_file_path(self):
+		return self.manifest_file_path
+
+	def get_source_mtimes(self):
+		source_mtimes = dict()
+		# The source modules sit beside this one; stat them directly
+		# rather than paying for importlib.util.find_spec
+		source_directory = os.path.dirname(os.path.abspath(__file__))
+		for module_name in PmbusDeviceManifest.SOURCE_MODULE_NAMES:
+			source_file_path = os.path.join(source_directory, module_name + ".py")
+			source_mtimes.update({module_name : os.path.getmtime(source_file_path)})
+		return source_mtimes
+
+	def load(self):
+		if self.device_types != None:
+			return
+		source_mtimes = self.get_source_mtimes()
+		manifest = self.read_manifest_file()
+		if (manifest == None) or (manifest.get(PmbusDeviceManifest.SOURCE_MTIMES_KEY) != source_mtimes):
+			manifest = self.build_manifest(source_mtimes)
+			self.write_manifest_file(manifest)
+		self.device_types = manifest[PmbusDeviceManifest.DEVICE_TYPES_KEY]
+
+	def read_manifest_file(self):
+		try:
+			input_file = open(self.manifest_file_path, 'r')
+		except OSError:
+			return None
+		try:
+			manifest = json.load(input_file)
+		except ValueError:
+			manifest = None
+		input_file.close()
+		return manifest
+
+	def write_manifest_file(self, manifest):
+		# A read-only install still works; it just rebuilds the manifest every run
+		try:
+			output_file = open(self.manifest_file_path, 'w')
+		except OSError:
+			return
+		json.dump(manifest, output_file, indent="\t")
+		output_file.close()
+
+	def build_manifest(self, source_mtimes):
+		from pmbus_devices import PmbusDevice
+
+		device_types = dict()
+		for pmbus_device_class in PmbusDevice.__subclasses__():
+			class_name = pmbus_device_class.__name__
+			device_types.update({class_name : {
+				PmbusDeviceManifest.MODULE_KEY : pmbus_device_class.__module__,
+				PmbusDeviceManifest.COMMAND_TABLE_FILE_PATH_KEY : PmbusDevice.get_command_table_file_path(class_name),
+			}})
+		return {PmbusDeviceManifest.SOURCE_MTIMES_KEY : source_mtimes, PmbusDeviceManifest.DEVICE_TYPES_KEY : device_types}
+
+	def get_device_type_names(self):
+		self.load()
+		return list(self.device_types)
+
+	def get_device_type_entry(self, device_type_name):
+		self.load()
+		try:
+			return self.device_types[device_type_name]
+		except KeyError:
+			raise PmbusDeviceManifestInvalidDeviceType(device_type_name)
+
+	def get_command_table_file_path(self, device_type_name):
+		return self.get_device_type_entry(device_type_name)[PmbusDeviceManifest.COMMAND_TABLE_FILE_PATH_KEY]
+
+	def get_device_class(self, device_type_name):
+		device_type_entry = self.get_device_type_entry(device_type_name)
+		module = importlib.import_module(device_type_entry[PmbusDeviceManifest.MODULE_KEY])
+		try:
+			return getattr(module, device_type_name)
+		except AttributeError:
+			raise PmbusDeviceManifestInvalidDeviceType(device_type_name)
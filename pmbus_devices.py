@@ -1,4 +1,3 @@
-from bitstring import BitArray, CreationError
 import copy
 
 from pmbus_command_table import *
@@ -58,22 +57,22 @@ class PmbusDevice:
 
 		return self.smbus_instance.read_i2c_block_data(self.device_address, command_address, command_num_data_bytes)
 
-	def get_linear_write_bytes(command_entry, value):
+	def get_linear_write_bytes(self, command_entry, value):
 		exponent = command_entry.get_exponent()
 		num_mantissa_bits = command_entry.get_num_mantissa_bits()
 		num_exponent_bits = command_entry.get_num_exponent_bits()
 		data_signed = command_entry.is_data_signed()
 
-		exponent_bit_array = calculate_exponent_bit_array(exponent, num_exponent_bits)
-		mantissa_bit_array = calculate_mantissa_bit_array(value, exponent, num_mantissa_bits, data_signed)
+		exponent_bit_array = self.calculate_exponent_bit_array(exponent, num_exponent_bits)
+		mantissa_bit_array = self.calculate_mantissa_bit_array(value, exponent, num_mantissa_bits, data_signed)
 		two_byte_bit_array = exponent_bit_array + mantissa_bit_array
 
 		lower_byte = two_byte_bit_array[8:16]
 		upper_byte = two_byte_bit_array[0:8]
 
 		write_bytes = [0, 0]
-		write_bytes[Q48SC12050.LSBYTE_LIST_INDEX] = lower_byte.int
-		write_bytes[Q48SC12050.MSBYTE_LIST_INDEX] = upper_byte.int
+		write_bytes[PmbusDevice.LSBYTE_LIST_INDEX] = lower_byte.uint
+		write_bytes[PmbusDevice.MSBYTE_LIST_INDEX] = upper_byte.uint
 
 		return write_bytes;
 
@@ -81,48 +80,57 @@ class PmbusDevice:
 		num_mantissa_bits = command_entry.get_num_mantissa_bits()
 		num_exponent_bits = command_entry.get_num_exponent_bits()
 
-		lower_byte = bytes_read[Q48SC12050.LSBYTE_LIST_INDEX]
-		upper_byte = bytes_read[Q48SC12050.MSBYTE_LIST_INDEX]
+		lower_byte = bytes_read[PmbusDevice.LSBYTE_LIST_INDEX]
+		upper_byte = bytes_read[PmbusDevice.MSBYTE_LIST_INDEX]
 
-		lower_byte_bit_array = BitArray(int=lower_byte, length=8)
-		upper_byte_bit_array = BitArray(int=upper_byte, length=8)
-		value_bit_array = upper_byte_bit_array + lower_byte_bit_array
-		mantissa_bit_array = value_bit_array[(16 - num_mantissa_bits):16]
-		exponent_bit_array = value_bit_array[0:num_exponent_bits]
+		# Plain int shifts rather than BitArray, so a one-shot read
+		# does not have to import bitstring just to decode a word
+		value_word = (upper_byte << 8) | lower_byte
+		mantissa_bits = value_word & ((1 << num_mantissa_bits) - 1)
+		exponent_bits = value_word >> (16 - num_exponent_bits)
 
-		exponent = self.calculate_exponent_value(exponent_bit_array, command_entry)
-		mantissa = self.calculate_mantissa_value(mantissa_bit_array, command_entry)
+		exponent = self.calculate_exponent_value(exponent_bits, num_exponent_bits, command_entry)
+		mantissa = self.calculate_mantissa_value(mantissa_bits, num_mantissa_bits, command_entry)
 		value = mantissa * (2 ** exponent)
 		return value
 
-	def calculate_exponent_value(self, exponent_bit_array, command_entry):
+	def calculate_exponent_value(self, exponent_bits, num_exponent_bits, command_entry):
 		expected_exponent = command_entry.get_exponent()
-		num_exponent_bits = len(exponent_bit_array)
 		if num_exponent_bits != 0:
-			actual_exponent = exponent_bit_array.int
+			actual_exponent = self.convert_bits_to_signed_int(exponent_bits, num_exponent_bits)
 			self.verify_correct_exponent(actual_exponent, command_entry)
 		return expected_exponent
 
-	def calculate_mantissa_value(self, mantissa_bit_array, command_entry):
+	def calculate_mantissa_value(self, mantissa_bits, num_mantissa_bits, command_entry):
 		data_signed = command_entry.is_data_signed()
 		if data_signed:
-			mantissa = mantissa_bit_array.int
+			mantissa = self.convert_bits_to_signed_int(mantissa_bits, num_mantissa_bits)
 		else:
-			mantissa = mantissa_bit_array.uint
+			mantissa = mantissa_bits
 		return mantissa
 
-	def calculate_exponent_bit_array(exponent, num_exponent_bits):
+	def convert_bits_to_signed_int(self, bits, num_bits):
+		sign_bit = 1 << (num_bits - 1)
+		if bits & sign_bit:
+			return bits - (sign_bit << 1)
+		return bits
+
+	def calculate_exponent_bit_array(self, exponent, num_exponent_bits):
+		from bitstring import BitArray, CreationError
+
 		if (num_exponent_bits == 0):
 			return BitArray()
 
 		try:
 			exponent_bit_array = BitArray(int=exponent, length=num_exponent_bits)
-		except bitstring.CreationError:
+		except CreationError:
 			print("Error creating Bit Array for exponent component")
 			raise
 		return exponent_bit_array
 
-	def calculate_mantissa_bit_array(value, exponent, num_mantissa_bits, signed):
+	def calculate_mantissa_bit_array(self, value, exponent, num_mantissa_bits, signed):
+		from bitstring import BitArray, CreationError
+
 		if (num_mantissa_bits == 0):
 			return BitArray()
 
@@ -138,7 +146,7 @@ class PmbusDevice:
 				int_bit_array = BitArray(int=int_value, length=num_int_binary_places)
 			else:
 				int_bit_array = BitArray(uint=int_value, length=num_int_binary_places)
-		except bitstring.CreationError:
+		except CreationError:
 			print("Error creating Bit Array for mantissa int component")
 			raise
 
@@ -152,6 +160,8 @@ class PmbusDevice:
 		return value_bit_array
 
 	def generate_bit_array_from_decimal(self, decimal_value, num_bits):
+		from bitstring import BitArray
+
 		bit_string = "0b";
 		binary_increment = .5
 		copy_decimal_value = copy.copy(decimal_value)
@@ -199,7 +209,7 @@ class q48sc12050(PmbusDevice):
 
 	def __init__(self, device_address, smbus_instance):
 		command_table_file_path = PmbusDevice.get_command_table_file_path(__class__.__name__)
-		command_table = PmbusCommandTable(command_table_file_path)
+		command_table = load_pmbus_command_table(command_table_file_path)
 		super().__init__(device_address, smbus_instance, command_table)
 	
 
@@ -0,0 +1,108 @@
+from argparse import ArgumentParser
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from pmbus_transaction_recording import PmbusTransaction, PmbusTransactionFile
+
+# Modules that should not be loaded just by importing the CLI
+DEFERRED_MODULE_NAMES = ["smbus2", "bitstring", "pmbus_devices", "pmbus_configuration", "pmbus_adaptive_polling", "pmbus_verification", "pmbus_transaction_recording", "multiprocessing"]
+
+BENCHMARK_DEVICE_TYPE = "q48sc12050"
+BENCHMARK_DEVICE_ADDRESS = 0x29
+BENCHMARK_SMBUS_NUMBER = 0
+BENCHMARK_COMMAND_NAME = "READ_VOUT"
+BENCHMARK_COMMAND_ADDRESS = 0x8B
+BENCHMARK_READ_RESULT = [0x00, 0xC0]
+
+INTERPRETER_SNIPPET = "pass"
+
+# A hardware read also imports smbus2 when it opens the bus; replay never does
+SMBUS_IMPORT_SNIPPET = "import smbus2"
+
+IMPORT_SNIPPET = f"""
+import sys
+import pmbus_communications_cli
+print(",".join(module_name for module_name in {DEFERRED_MODULE_NAMES!r} if module_name in sys.modules))
+"""
+
+CLI_SCRIPT_FILE_NAME = "pmbus_communications_cli.py"
+
+# The warm-up run has to be able to write bytecode, otherwise every run
+# recompiles each module from source and measures that instead
+BENCHMARK_ENVIRONMENT = {name : value for name, value in os.environ.items() if name != "PYTHONDONTWRITEBYTECODE"}
+
+# Answers to the setup prompts for one power brick, then a single read
+CLI_INPUT = f"1\n{BENCHMARK_DEVICE_TYPE}\n{hex(BENCHMARK_DEVICE_ADDRESS)}\n{BENCHMARK_SMBUS_NUMBER}\nread {BENCHMARK_COMMAND_NAME} -a {hex(BENCHMARK_DEVICE_ADDRESS)}\n"
+CLI_LAST_PROMPT_SUFFIX = "SMBus Number: "
+
+def write_benchmark_recording(replay_directory):
+	"""
+	Writes a single-transaction recording for the benchmark
+	read so the one-shot path runs without hardware
+	"""
+	file_path = PmbusTransactionFile.get_recording_file_path(replay_directory, BENCHMARK_SMBUS_NUMBER)
+	output_file = open(file_path, 'wb')
+	PmbusTransactionFile.write_file_header(output_file)
+	PmbusTransactionFile.write_transaction(output_file, PmbusTransaction(0.0, 0.0, PmbusTransaction.OPERATION_READ_I2C_BLOCK_DATA,
+		BENCHMARK_DEVICE_ADDRESS, BENCHMARK_COMMAND_ADDRESS, [len(BENCHMARK_READ_RESULT)], BENCHMARK_READ_RESULT, PmbusTransaction.STATUS_OK))
+	output_file.close()
+
+def time_interpreter(interpreter_arguments, num_runs, input_text=None):
+	run_times = []
+	for i in range(num_runs):
+		start_time = time.perf_counter()
+		completed_process = subprocess.run([sys.executable] + interpreter_arguments, cwd=os.path.dirname(os.path.abspath(__file__)), input=input_text, capture_output=True, text=True, env=BENCHMARK_ENVIRONMENT)
+		run_times.append(time.perf_counter() - start_time)
+		if completed_process.returncode != 0:
+			print(completed_process.stderr, file=sys.stderr)
+			raise SystemExit(completed_process.returncode)
+	return statistics.median(run_times), completed_process.stdout.strip()
+
+def time_snippet(snippet, num_runs):
+	return time_interpreter(["-c", snippet], num_runs)
+
+def time_cli_read(replay_directory, num_runs):
+	"""
+	Runs the CLI script itself against the benchmark recording
+	with the setup prompts and read command piped to stdin;
+	returns the median time and the value the read printed
+	"""
+	cli_arguments = [CLI_SCRIPT_FILE_NAME, "--replay", replay_directory, "--time-scale", "0"]
+	read_time, cli_output = time_interpreter(cli_arguments, num_runs, CLI_INPUT)
+	# The last prompt leaves no newline, so the result follows it on the same line
+	return read_time, cli_output.rsplit(CLI_LAST_PROMPT_SUFFIX, 1)[-1]
+
+if __name__ == "__main__":
+	benchmark_parser = ArgumentParser(description="Measures CLI import time and one-shot read latency in fresh interpreters")
+	benchmark_parser.add_argument("-n", "--runs", type=int, default=20, help="Number of interpreter launches per measurement")
+	benchmark_parser.add_argument("--max-read-ms", type=float, help="Exit with an error if the one-shot read, including the smbus2 import, takes longer than this above bare interpreter startup")
+	arguments = benchmark_parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as replay_directory:
+		write_benchmark_recording(replay_directory)
+
+		# Warm the bytecode and device manifest caches so every run measures a warm start
+		time_cli_read(replay_directory, 1)
+
+		interpreter_time, interpreter_output = time_snippet(INTERPRETER_SNIPPET, arguments.runs)
+		import_time, deferred_modules_loaded = time_snippet(IMPORT_SNIPPET, arguments.runs)
+		read_time, read_output = time_cli_read(replay_directory, arguments.runs)
+		smbus_import_time, smbus_import_output = time_snippet(SMBUS_IMPORT_SNIPPET, arguments.runs)
+
+	import_ms = (import_time - interpreter_time) * 1000
+	read_ms = (read_time - interpreter_time) * 1000
+	hardware_read_ms = read_ms + (smbus_import_time - interpreter_time) * 1000
+	print(f"Interpreter startup:  {interpreter_time * 1000:8.2f} ms")
+	print(f"CLI import:           {import_ms:8.2f} ms above interpreter startup")
+	print(f"One-shot read:        {read_ms:8.2f} ms above interpreter startup ({BENCHMARK_COMMAND_NAME} = {read_output})")
+	print(f"With smbus2 import:   {hardware_read_ms:8.2f} ms above interpreter startup, as paid by a read from hardware")
+	if deferred_modules_loaded != "":
+		print(f"Loaded at import but expected to be deferred: {deferred_modules_loaded}")
+
+	if (arguments.max_read_ms != None) and (hardware_read_ms > arguments.max_read_ms):
+		print(f"One-shot read exceeds {arguments.max_read_ms} ms")
+		raise SystemExit(1)
@@ -0,0 +1,306 @@
+import collections
+import errno
+import struct
+import time
+
+class PmbusTransactionRecordingBaseError(Exception):
+	def __init__(self, error_message):
+		super().__init__(error_message)
+		self.error_message = error_message
+
+class PmbusTransactionRecordingInvalidFile(PmbusTransactionRecordingBaseError):
+	def __init__(self, file_path):
+		super().__init__(f"{file_path} is not a PMBus transaction recording")
+
+class PmbusTransactionReplayExhausted(PmbusTransactionRecordingBaseError):
+	def __init__(self, operation_name, device_address, command_address):
+		super().__init__(f"Recording has no transactions left for {operation_name} to {hex(device_address)} command {hex(command_address)}")
+
+class PmbusTransactionReplayMismatch(PmbusTransactionRecordingBaseError):
+	def __init__(self, transaction_index, expected, actual):
+		super().__init__(f"Transaction #{transaction_index} does not match recording; recorded {expected}, replayed {actual}")
+
+class PmbusTransaction:
+	"""
+	A single recorded SMBus transaction; start time and
+	duration are in seconds relative to the start of the
+	recording
+	"""
+
+	OPERATION_READ_I2C_BLOCK_DATA = 0
+	OPERATION_WRITE_I2C_BLOCK_DATA = 1
+	OPERATION_WRITE_BYTE = 2
+
+	OPERATION_NAMES = ["read_i2c_block_data", "write_i2c_block_data", "write_byte"]
+
+	STATUS_OK = 0
+	STATUS_ERROR = 1
+
+	def __init__(self, start_time, duration, operation, device_address, command_address, payload, result, status, error_number=0):
+		self.start_time = start_time
+		self.duration = duration
+		self.operation = operation
+		self.device_address = device_address
+		self.command_address = command_address
+		self.payload = payload
+		self.result = result
+		self.status = status
+		self.error_number = error_number
+
+	def get_start_time(self):
+		return self.start_time
+
+	def get_duration(self):
+		return self.duration
+
+	def get_operation(self):
+		return self.operation
+
+	def get_operation_name(self):
+		return PmbusTransaction.OPERATION_NAMES[self.operation]
+
+	def get_device_address(self):
+		return self.device_address
+
+	def get_command_address(self):
+		return self.command_address
+
+	def get_payload(self):
+		return self.payload
+
+	def get_result(self):
+		return self.result
+
+	def is_error(self):
+		return self.status == PmbusTransaction.STATUS_ERROR
+
+	def get_error_number(self):
+		return self.error_number
+
+	def __str__(self):
+		return f"{self.get_operation_name()} {hex(self.device_address)} {hex(self.command_address)} {self.payload}"
+
+class PmbusTransactionFile:
+	"""
+	Compact binary transaction log; a short file header followed
+	by one fixed size record header per transaction and its
+	payload and result bytes
+	"""
+
+	FILE_HEADER = b"PMBR\x01"
+	FILE_EXTENSION = ".pmbr"
+
+	# start time, duration, operation, device address, command address, status, error number, payload length, result length
+	RECORD_HEADER_FORMAT = struct.Struct("<dfBBBBBBB")
+
+	def get_recording_file_path(directory, smbus_number):
+		return f"{directory}/smbus{smbus_number}{PmbusTransactionFile.FILE_EXTENSION}"
+
+	def write_file_header(output_file):
+		output_file.write(PmbusTransactionFile.FILE_HEADER)
+
+	def write_transaction(output_file, transaction):
+		payload = bytes(transaction.get_payload())
+		result = bytes(transaction.get_result())
+		record_header = PmbusTransactionFile.RECORD_HEADER_FORMAT.pack(transaction.get_start_time(), transaction.get_duration(), transaction.get_operation(),
+			transaction.get_device_address(), transaction.get_command_address(), transaction.status, transaction.get_error_number() & 0xFF, len(payload), len(result))
+		output_file.write(record_header + payload + result)
+
+	def read_transactions(file_path):
+		input_file = open(file_path, 'rb')
+		file_data = input_file.read()
+		input_file.close()
+
+		if not file_data.startswith(PmbusTransactionFile.FILE_HEADER):
+			raise PmbusTransactionRecordingInvalidFile(file_path)
+
+		transactions = []
+		record_header_size = PmbusTransactionFile.RECORD_HEADER_FORMAT.size
+		offset = len(PmbusTransactionFile.FILE_HEADER)
+		while offset + record_header_size <= len(file_data):
+			start_time, duration, operation, device_address, command_address, status, error_number, payload_length, result_length = PmbusTransactionFile.RECORD_HEADER_FORMAT.unpack_from(file_data, offset)
+			offset += record_header_size
+			payload = list(file_data[offset:offset + payload_length])
+			offset += payload_length
+			result = list(file_data[offset:offset + result_length])
+			offset += result_length
+			transactions.append(PmbusTransaction(start_time, duration, operation, device_address, command_address, payload, result, status, error_number))
+		return transactions
+
+class PmbusTransactionRecorder:
+	"""
+	Wraps the SMBus handle given to a PmbusDevice and logs every
+	transaction it carries to a recording file; anything other
+	than the recorded operations is passed straight through
+	"""
+
+	def __init__(self, smbus_instance, file_path):
+		self.smbus_instance = smbus_instance
+		self.file_path = file_path
+		self.output_file = open(file_path, 'wb')
+		PmbusTransactionFile.write_file_header(self.output_file)
+		self.recording_start_time = time.perf_counter()
+
+	def get_file_path(self):
+		return self.file_path
+
+	def record(self, operation, device_address, command_address, payload, smbus_function, *smbus_arguments):
+		start_time = time.perf_counter()
+		try:
+			result = smbus_function(*smbus_arguments)
+		except OSError as err:
+			duration = time.perf_counter() - start_time
+			error_number = err.errno if err.errno != None else errno.EIO
+			self.write_transaction(PmbusTransaction(start_time - self.recording_start_time, duration, operation, device_address, command_address, payload, [], PmbusTransaction.STATUS_ERROR, error_number))
+			raise
+		duration = time.perf_counter() - start_time
+		result_bytes = [] if result == None else list(result)
+		self.write_transaction(PmbusTransaction(start_time - self.recording_start_time, duration, operation, device_address, command_address, payload, result_bytes, PmbusTransaction.STATUS_OK))
+		return result
+
+	def write_transaction(self, transaction):
+		PmbusTransactionFile.write_transaction(self.output_file, transaction)
+
+	def read_i2c_block_data(self, i2c_addr, register, length, force=None):
+		return self.record(PmbusTransaction.OPERATION_READ_I2C_BLOCK_DATA, i2c_addr, register, [length], self.smbus_instance.read_i2c_block_data, i2c_addr, register, length)
+
+	def write_i2c_block_data(self, i2c_addr, register, data, force=None):
+		return self.record(PmbusTransaction.OPERATION_WRITE_I2C_BLOCK_DATA, i2c_addr, register, list(data), self.smbus_instance.write_i2c_block_data, i2c_addr, register, data)
+
+	def write_byte(self, i2c_addr, value, force=None):
+		return self.record(PmbusTransaction.OPERATION_WRITE_BYTE, i2c_addr, value, [], self.smbus_instance.write_byte, i2c_addr, value)
+
+	def close(self):
+		self.output_file.close()
+		self.smbus_instance.close()
+
+	def __getattr__(self, name):
+		return getattr(self.smbus_instance, name)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+class PmbusReplayBus:
+	"""
+	Stands in for an SMBus handle and serves the transactions of
+	a recording back; order is kept per device address and
+	command code rather than across the whole bus, so callers
+	whose interleaving depends on timing, like the adaptive
+	poller, still replay. Each transaction takes its recorded
+	duration multiplied by time_scale, so 1.0 replays at the
+	original bus speed and 0.0 as fast as possible
+	"""
+
+	def __init__(self, file_path, time_scale=1.0, verify_writes=True):
+		self.file_path = file_path
+		self.time_scale = time_scale
+		self.verify_writes = verify_writes
+		self.transactions = PmbusTransactionFile.read_transactions(file_path)
+		self.transaction_queues = dict()
+		for transaction_index, transaction in enumerate(self.transactions):
+			queue_key = (transaction.get_device_address(), transaction.get_command_address())
+			if queue_key not in self.transaction_queues:
+				self.transaction_queues.update({queue_key : collections.deque()})
+			self.transaction_queues[queue_key].append(transaction_index)
+		self.num_transactions_replayed = 0
+
+	def get_file_path(self):
+		return self.file_path
+
+	def get_num_transactions(self):
+		return len(self.transactions)
+
+	def get_num_transactions_replayed(self):
+		return self.num_transactions_replayed
+
+	def get_recorded_bus_time(self):
+		return sum(transaction.get_duration() for transaction in self.transactions)
+
+	def get_recorded_elapsed_time(self):
+		if len(self.transactions) == 0:
+			return 0.0
+		last_transaction = self.transactions[-1]
+		return last_transaction.get_start_time() + last_transaction.get_duration()
+
+	def replay(self, operation, device_address, command_address, payload):
+		transaction_queue = self.transaction_queues.get((device_address, command_address))
+		if (transaction_queue == None) or (len(transaction_queue) == 0):
+			raise PmbusTransactionReplayExhausted(PmbusTransaction.OPERATION_NAMES[operation], device_address, command_address)
+		transaction_index = transaction_queue[0]
+		transaction = self.transactions[transaction_index]
+
+		replayed_transaction = PmbusTransaction(0.0, 0.0, operation, device_address, command_address, payload, [], PmbusTransaction.STATUS_OK)
+		if transaction.get_operation() != operation:
+			raise PmbusTransactionReplayMismatch(transaction_index, transaction, replayed_transaction)
+		if self.verify_writes and (transaction.get_payload() != payload):
+			raise PmbusTransactionReplayMismatch(transaction_index, transaction, replayed_transaction)
+		transaction_queue.popleft()
+		self.num_transactions_replayed += 1
+
+		if self.time_scale > 0:
+			time.sleep(transaction.get_duration() * self.time_scale)
+		if transaction.is_error():
+			raise OSError(transaction.get_error_number(), f"Replayed error from recording {self.file_path}")
+		return transaction.get_result()
+
+	def read_i2c_block_data(self, i2c_addr, register, length, force=None):
+		return self.replay(PmbusTransaction.OPERATION_READ_I2C_BLOCK_DATA, i2c_addr, register, [length])
+
+	def write_i2c_block_data(self, i2c_addr, register, data, force=None):
+		self.replay(PmbusTransaction.OPERATION_WRITE_I2C_BLOCK_DATA, i2c_addr, register, list(data))
+
+	def write_byte(self, i2c_addr, value, force=None):
+		self.replay(PmbusTransaction.OPERATION_WRITE_BYTE, i2c_addr, value, [])
+
+	def enable_pec(self, enable=True):
+		pass
+
+	def close(self):
+		pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+class PmbusSmbusFactory:
+	"""
+	Opens the hardware SMBus handle for a bus number; factories
+	are passed to code that opens its own handles, such as bus
+	worker processes, so they must stay picklable
+	"""
+
+	def __call__(self, smbus_number):
+		from smbus2 import SMBus
+		return SMBus(smbus_number)
+
+class PmbusRecordingSmbusFactory(PmbusSmbusFactory):
+	"""
+	Opens the hardware SMBus handle for a bus number and records
+	it to that bus's file in record_directory
+	"""
+
+	def __init__(self, record_directory):
+		self.record_directory = record_directory
+
+	def __call__(self, smbus_number):
+		smbus_instance = super().__call__(smbus_number)
+		return PmbusTransactionRecorder(smbus_instance, PmbusTransactionFile.get_recording_file_path(self.record_directory, smbus_number))
+
+class PmbusReplaySmbusFactory(PmbusSmbusFactory):
+	"""
+	Replays the recording of a bus number from replay_directory
+	instead of opening hardware
+	"""
+
+	def __init__(self, replay_directory, time_scale=1.0, verify_writes=True):
+		self.replay_directory = replay_directory
+		self.time_scale = time_scale
+		self.verify_writes = verify_writes
+
+	def __call__(self, smbus_number):
+		return PmbusReplayBus(PmbusTransactionFile.get_recording_file_path(self.replay_directory, smbus_number), self.time_scale, self.verify_writes)
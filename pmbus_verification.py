@@ -0,0 +1,197 @@
+import os
+import threading
+
+from pmbus_devices import *
+
+class PmbusVerifiedWrite:
+	"""
+	A queued write and the outcome of its readback
+	"""
+
+	STATUS_PENDING = "pending"
+	STATUS_VERIFIED = "verified"
+	STATUS_MISMATCH = "mismatch"
+	STATUS_UNVERIFIED = "unverified"
+	STATUS_WRITE_ERROR = "write error"
+	STATUS_READ_ERROR = "read error"
+
+	def __init__(self, device, command_entry, bytes_to_write):
+		self.device = device
+		self.command_entry = command_entry
+		self.bytes_to_write = bytes_to_write
+		self.bytes_read = None
+		self.error = None
+		self.status = PmbusVerifiedWrite.STATUS_PENDING
+
+	def get_device(self):
+		return self.device
+
+	def get_device_address(self):
+		return self.device.get_device_address()
+
+	def get_command_name(self):
+		return self.command_entry.get_command_name()
+
+	def get_command_entry(self):
+		return self.command_entry
+
+	def get_bytes_to_write(self):
+		return self.bytes_to_write
+
+	def get_bytes_read(self):
+		return self.bytes_read
+
+	def get_error(self):
+		return self.error
+
+	def get_status(self):
+		return self.status
+
+	def is_readback_possible(self):
+		return self.command_entry.is_read_enabled() and (self.command_entry.get_num_data_bytes() > 0)
+
+	def is_failed(self):
+		return self.status in (PmbusVerifiedWrite.STATUS_MISMATCH, PmbusVerifiedWrite.STATUS_WRITE_ERROR, PmbusVerifiedWrite.STATUS_READ_ERROR)
+
+	def __str__(self):
+		message = f"{hex(self.get_device_address())} {self.get_command_name()}: {self.status}"
+		if self.status == PmbusVerifiedWrite.STATUS_MISMATCH:
+			message += f"; wrote {self.bytes_to_write}, read {self.bytes_read}"
+		elif self.error != None:
+			message += f"; {self.error}"
+		return message
+
+class PmbusVerificationReport:
+
+	def __init__(self, verified_writes):
+		self.verified_writes = verified_writes
+
+	def get_results(self):
+		return list(self.verified_writes)
+
+	def get_failures(self):
+		return [verified_write for verified_write in self.verified_writes if verified_write.is_failed()]
+
+	def is_verified(self):
+		return len(self.get_failures()) == 0
+
+	def is_device_verified(self, device):
+		# Matched by device rather than address; the same address may be used on several buses
+		for verified_write in self.get_failures():
+			if verified_write.get_device() is device:
+				return False
+		return True
+
+	def __str__(self):
+		return "\n".join(str(verified_write) for verified_write in self.verified_writes)
+
+class PmbusVerifiedWriter:
+	"""
+	Queues writes across any number of devices and verifies
+	them with a single readback sweep; each SMBus bus is driven
+	by its own thread, and on each bus every write is issued
+	before any readback so devices settle while the rest of
+	the bus is being written
+	"""
+
+	def __init__(self):
+		self.verified_writes = []
+
+	def queue_write(self, device, command, bytes_to_write=[]):
+		# command -> Command Name OR Command Address
+		command_entry = device.get_command_table_entry(command)
+
+		if not isinstance(bytes_to_write, list):
+			bytes_to_write = [bytes_to_write]
+
+		device.verify_command_write_enabled(command_entry)
+		device.verify_command_correct_num_data_bytes(len(bytes_to_write), command_entry)
+		self.verified_writes.append(PmbusVerifiedWrite(device, command_entry, bytes_to_write))
+
+	def get_num_queued_writes(self):
+		return len(self.verified_writes)
+
+	def execute(self):
+		bus_queues = self.group_writes_by_bus()
+
+		bus_threads = []
+		for bus_queue in bus_queues:
+			bus_thread = threading.Thread(target=self.execute_bus_queue, args=(bus_queue,))
+			bus_thread.start()
+			bus_threads.append(bus_thread)
+		for bus_thread in bus_threads:
+			bus_thread.join()
+
+		report = PmbusVerificationReport(self.verified_writes)
+		self.verified_writes = []
+		return report
+
+	def get_bus_key(self, smbus_instance):
+		# Separately opened handles to one adapter share a bus, so key on the i2c-dev device node
+		fd = getattr(smbus_instance, "fd", None)
+		if fd != None:
+			try:
+				return os.fstat(fd).st_rdev
+			except OSError:
+				pass
+		return id(smbus_instance)
+
+	def group_writes_by_bus(self):
+		bus_queues = dict()
+		for verified_write in self.verified_writes:
+			bus_key = self.get_bus_key(verified_write.get_device().smbus_instance)
+			if bus_key not in bus_queues:
+				bus_queues.update({bus_key : []})
+			bus_queues[bus_key].append(verified_write)
+		return list(bus_queues.values())
+
+	def execute_bus_queue(self, bus_queue):
+		for verified_write in bus_queue:
+			try:
+				verified_write.get_device().write_bytes(verified_write.get_command_name(), verified_write.get_bytes_to_write())
+			except Exception as err:
+				verified_write.error = err
+				verified_write.status = PmbusVerifiedWrite.STATUS_WRITE_ERROR
+
+		# Only the last write to each register can be checked against its readback
+		last_writes = dict()
+		for verified_write in bus_queue:
+			if verified_write.get_status() == PmbusVerifiedWrite.STATUS_PENDING:
+				verified_write.status = PmbusVerifiedWrite.STATUS_UNVERIFIED
+				if verified_write.is_readback_possible():
+					last_writes.update({(id(verified_write.get_device()), verified_write.get_command_name()) : verified_write})
+
+		for verified_write in last_writes.values():
+			self.read_back(verified_write)
+
+	def read_back(self, verified_write):
+		try:
+			bytes_read = verified_write.get_device().read_bytes(verified_write.get_command_name())
+		except Exception as err:
+			verified_write.error = err
+			verified_write.status = PmbusVerifiedWrite.STATUS_READ_ERROR
+			return
+
+		verified_write.bytes_read = list(bytes_read)
+		if self.is_readback_match(verified_write):
+			verified_write.status = PmbusVerifiedWrite.STATUS_VERIFIED
+		else:
+			verified_write.status = PmbusVerifiedWrite.STATUS_MISMATCH
+
+	def is_readback_match(self, verified_write):
+		bytes_to_write = verified_write.get_bytes_to_write()
+		bytes_read = verified_write.get_bytes_read()
+		command_entry = verified_write.get_command_entry()
+		if bytes_read == bytes_to_write:
+			return True
+		if not command_entry.is_linear_data_format():
+			return False
+
+		# Devices may round the written value to their own resolution; allow one LSB
+		device = verified_write.get_device()
+		try:
+			value_written = device.get_linear_read_value(command_entry, bytes_to_write)
+			value_read = device.get_linear_read_value(command_entry, bytes_read)
+		except PmbusDeviceBaseError:
+			return False
+		return abs(value_read - value_written) <= 2 ** command_entry.get_exponent()
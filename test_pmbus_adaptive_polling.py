@@ -0,0 +1,173 @@
+import time
+import unittest
+
+from fake_smbus import FakeSmbus
+from pmbus_adaptive_polling import *
+
+class PmbusAdaptivePollerTest(unittest.TestCase):
+
+	DEVICE_ADDRESS = 0x29
+	OTHER_DEVICE_ADDRESS = 0x2A
+
+	def setUp(self):
+		self.smbus_instance = FakeSmbus()
+		self.device = q48sc12050(PmbusAdaptivePollerTest.DEVICE_ADDRESS, self.smbus_instance)
+		self.other_device = q48sc12050(PmbusAdaptivePollerTest.OTHER_DEVICE_ADDRESS, self.smbus_instance)
+		for device in (self.device, self.other_device):
+			self.set_linear_value(device, "READ_VIN", 48.0)
+			self.set_status_word(device, [0x00, 0x00])
+
+	def set_linear_value(self, device, command_name, value):
+		command_entry = device.get_command_table_entry(command_name)
+		self.smbus_instance.set_register(device.get_device_address(), command_entry.get_command_address(), device.get_linear_write_bytes(command_entry, value))
+
+	def set_status_word(self, device, status_bytes):
+		command_entry = device.get_command_table_entry(PmbusAdaptivePoller.STATUS_COMMAND_NAME)
+		self.smbus_instance.set_register(device.get_device_address(), command_entry.get_command_address(), status_bytes)
+
+	def get_lsb(self, command_name):
+		return 2 ** self.device.get_command_table_entry(command_name).get_exponent()
+
+	def test_unchanged_value_backs_off_to_max_period(self):
+		poller = PmbusAdaptivePoller(min_period=0.1, max_period=0.8, backoff_factor=2.0)
+		channel = poller.add_channel(self.device, "READ_VIN")
+
+		self.assertEqual(len(poller.poll_once(0.0)), 1)
+		periods = []
+		for i in range(5):
+			now = channel.get_next_poll_time()
+			self.assertEqual(poller.poll_once(now), [])
+			periods.append(channel.get_period())
+		self.assertEqual(periods, [0.2, 0.4, 0.8, 0.8, 0.8])
+
+	def test_change_inside_deadband_is_not_reported(self):
+		poller = PmbusAdaptivePoller(deadband_num_lsbs=2)
+		channel = poller.add_channel(self.device, "READ_VIN")
+		poller.poll_once(0.0)
+
+		self.set_linear_value(self.device, "READ_VIN", 48.0 + self.get_lsb("READ_VIN"))
+		self.assertEqual(poller.poll_once(channel.get_next_poll_time()), [])
+		self.assertEqual(channel.get_last_emitted_value(), 48.0)
+
+	def test_change_outside_deadband_is_reported_and_resets_period(self):
+		poller = PmbusAdaptivePoller(min_period=0.1, max_period=5.0, deadband_num_lsbs=2)
+		channel = poller.add_channel(self.device, "READ_VIN")
+		poller.poll_once(0.0)
+		for i in range(3):
+			poller.poll_once(channel.get_next_poll_time())
+		self.assertGreater(channel.get_period(), 0.1)
+
+		new_value = 48.0 + 3 * self.get_lsb("READ_VIN")
+		self.set_linear_value(self.device, "READ_VIN", new_value)
+		now = channel.get_next_poll_time()
+		events = poller.poll_once(now)
+		self.assertEqual([event.get_value() for event in events], [new_value])
+		self.assertEqual(channel.get_period(), 0.1)
+		self.assertEqual(channel.get_next_poll_time(), now + 0.1)
+
+	def test_channel_is_not_read_before_it_is_due(self):
+		poller = PmbusAdaptivePoller(min_period=0.1)
+		poller.add_channel(self.device, "READ_VIN")
+		poller.poll_once(0.0)
+
+		num_reads = self.smbus_instance.num_reads
+		poller.poll_once(0.05)
+		self.assertEqual(self.smbus_instance.num_reads, num_reads)
+
+	def test_status_bit_wakes_only_that_devices_channels(self):
+		poller = PmbusAdaptivePoller(min_period=0.1, max_period=5.0)
+		poller.add_device(self.device, ["READ_VIN"])
+		poller.add_device(self.other_device, ["READ_VIN"])
+		now = 0.0
+		for i in range(20):
+			poller.poll_once(now)
+			now += 0.1
+		device_vin_channel, device_status_channel, other_vin_channel, other_status_channel = poller.get_channels()
+		other_vin_poll_time = other_vin_channel.get_next_poll_time()
+
+		self.set_status_word(self.device, [0x04, 0x00])
+		now = device_status_channel.get_next_poll_time()
+		events = poller.poll_once(now)
+
+		self.assertIn((PmbusAdaptivePoller.STATUS_COMMAND_NAME, [0x04, 0x00]), [(event.get_command_name(), event.get_value()) for event in events])
+		self.assertEqual(device_vin_channel.get_next_poll_time(), now)
+		self.assertEqual(device_vin_channel.get_period(), 0.1)
+		self.assertEqual(device_status_channel.get_next_poll_time(), now + 0.1)
+		self.assertEqual(other_vin_channel.get_next_poll_time(), other_vin_poll_time)
+
+	def test_set_status_bit_holds_min_period(self):
+		poller = PmbusAdaptivePoller(min_period=0.1, max_period=5.0)
+		poller.add_device(self.device, [])
+		status_channel = poller.get_channels()[0]
+		self.set_status_word(self.device, [0x04, 0x00])
+
+		now = 0.0
+		for i in range(10):
+			poller.poll_once(now)
+			self.assertEqual(status_channel.get_period(), 0.1)
+			now = status_channel.get_next_poll_time()
+
+	def test_status_channel_backs_off_no_further_than_status_max_period(self):
+		poller = PmbusAdaptivePoller(min_period=0.1, max_period=5.0, status_max_period=0.4)
+		poller.add_device(self.device, ["READ_VIN"])
+		vin_channel, status_channel = poller.get_channels()
+
+		now = 0.0
+		for i in range(200):
+			poller.poll_once(now)
+			now += 0.05
+		self.assertEqual(status_channel.get_period(), 0.4)
+		self.assertEqual(vin_channel.get_period(), 5.0)
+
+	def test_status_max_period_is_limited_by_max_period(self):
+		poller = PmbusAdaptivePoller(min_period=0.1, max_period=0.2, status_max_period=0.5)
+		poller.add_device(self.device, [])
+		status_channel = poller.get_channels()[0]
+
+		now = 0.0
+		for i in range(10):
+			poller.poll_once(now)
+			now = status_channel.get_next_poll_time()
+		self.assertEqual(status_channel.get_period(), 0.2)
+
+	def test_read_error_is_reported_and_retried_at_min_period(self):
+		poller = PmbusAdaptivePoller(min_period=0.1)
+		channel = poller.add_channel(self.device, "READ_VIN")
+		poller.poll_once(0.0)
+
+		self.smbus_instance.failing_registers.add((PmbusAdaptivePollerTest.DEVICE_ADDRESS, self.device.get_command_table_entry("READ_VIN").get_command_address()))
+		now = channel.get_next_poll_time()
+		events = poller.poll_once(now)
+		self.assertEqual(len(events), 1)
+		self.assertIsInstance(events[0].get_error(), OSError)
+		self.assertEqual(channel.get_next_poll_time(), now + 0.1)
+
+		# The first good read after an error is always reported
+		self.smbus_instance.failing_registers.clear()
+		events = poller.poll_once(channel.get_next_poll_time())
+		self.assertEqual([event.get_value() for event in events], [48.0])
+
+	def test_events_are_stamped_with_wall_clock_time(self):
+		poller = PmbusAdaptivePoller()
+		poller.add_channel(self.device, "READ_VIN")
+		start_time = time.time()
+		events = poller.poll_once(0.0)
+		self.assertGreaterEqual(events[0].get_timestamp(), start_time)
+		self.assertLessEqual(events[0].get_timestamp(), time.time())
+
+	def test_invalid_periods_are_rejected(self):
+		for min_period, max_period in [(0, 1.0), (-0.1, 1.0), (0.5, 0.1)]:
+			with self.assertRaises(PmbusAdaptivePollerInvalidPeriod):
+				PmbusAdaptivePoller(min_period, max_period)
+		with self.assertRaises(PmbusAdaptivePollerInvalidBackoffFactor):
+			PmbusAdaptivePoller(backoff_factor=0.5)
+
+	def test_empty_poller_has_no_next_poll_time(self):
+		poller = PmbusAdaptivePoller()
+		self.assertEqual(poller.get_next_poll_time(), None)
+		self.assertEqual(poller.poll_once(0.0), [])
+		with self.assertRaises(PmbusAdaptivePollerNoChannels):
+			poller.run(print, 0.1)
+
+if __name__ == "__main__":
+	unittest.main()
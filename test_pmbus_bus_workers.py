@@ -0,0 +1,81 @@
+import time
+import unittest
+
+from fake_smbus import FakeSmbusFactory
+from pmbus_bus_workers import *
+
+class PmbusBusWorkerPoolTest(unittest.TestCase):
+
+	DEVICE_ADDRESS = 0x29
+	OTHER_DEVICE_ADDRESS = 0x2A
+	COMMAND_NAMES = ["READ_VIN", "READ_VOUT"]
+	POLL_PERIOD = 0.01
+	SWEEP_TIMEOUT = 5.0
+
+	def setUp(self):
+		self.table_device = q48sc12050(PmbusBusWorkerPoolTest.DEVICE_ADDRESS, None)
+
+	def get_register_key(self, device_address, command_name):
+		return (device_address, self.table_device.get_command_table_entry(command_name).get_command_address())
+
+	def get_linear_bytes(self, command_name, value):
+		return self.table_device.get_linear_write_bytes(self.table_device.get_command_table_entry(command_name), value)
+
+	def get_linear_registers(self, device_address, read_vin, read_vout):
+		return {self.get_register_key(device_address, "READ_VIN") : self.get_linear_bytes("READ_VIN", read_vin),
+			self.get_register_key(device_address, "READ_VOUT") : self.get_linear_bytes("READ_VOUT", read_vout)}
+
+	def create_pool(self, bus_registers):
+		pool = PmbusBusWorkerPool(PmbusBusWorkerPoolTest.COMMAND_NAMES, PmbusBusWorkerPoolTest.POLL_PERIOD, FakeSmbusFactory(bus_registers))
+		for bus_number, registers in bus_registers.items():
+			for device_address in sorted(set(register_key[0] for register_key in registers)):
+				pool.add_device(bus_number, "q48sc12050", device_address)
+		return pool
+
+	def wait_for_sweep(self, pool):
+		deadline = time.monotonic() + PmbusBusWorkerPoolTest.SWEEP_TIMEOUT
+		while min(pool.get_sweep_counts().values()) == 0:
+			self.assertLess(time.monotonic(), deadline)
+			time.sleep(PmbusBusWorkerPoolTest.POLL_PERIOD)
+
+	def test_samples_from_each_bus_are_decoded(self):
+		bus_registers = {0 : self.get_linear_registers(PmbusBusWorkerPoolTest.DEVICE_ADDRESS, 48.0, 12.0),
+			1 : self.get_linear_registers(PmbusBusWorkerPoolTest.DEVICE_ADDRESS, 36.0, 11.5)}
+		with self.create_pool(bus_registers) as pool:
+			self.wait_for_sweep(pool)
+			samples = pool.read_samples()
+
+		self.assertEqual(samples, {(0, PmbusBusWorkerPoolTest.DEVICE_ADDRESS, "READ_VIN") : 48.0, (0, PmbusBusWorkerPoolTest.DEVICE_ADDRESS, "READ_VOUT") : 12.0,
+			(1, PmbusBusWorkerPoolTest.DEVICE_ADDRESS, "READ_VIN") : 36.0, (1, PmbusBusWorkerPoolTest.DEVICE_ADDRESS, "READ_VOUT") : 11.5})
+
+	def test_short_read_is_a_read_error_and_keeps_other_channels(self):
+		registers = self.get_linear_registers(PmbusBusWorkerPoolTest.DEVICE_ADDRESS, 48.0, 12.0)
+		registers.update(self.get_linear_registers(PmbusBusWorkerPoolTest.OTHER_DEVICE_ADDRESS, 36.0, 11.5))
+		# READ_VOUT has no exponent bits, so a misplaced byte would still decode to a value
+		registers.update({self.get_register_key(PmbusBusWorkerPoolTest.DEVICE_ADDRESS, "READ_VOUT") : [0x05]})
+		with self.create_pool({0 : registers}) as pool:
+			self.wait_for_sweep(pool)
+			samples = pool.read_samples()
+
+		self.assertEqual(samples, {(0, PmbusBusWorkerPoolTest.DEVICE_ADDRESS, "READ_VIN") : 48.0, (0, PmbusBusWorkerPoolTest.DEVICE_ADDRESS, "READ_VOUT") : None,
+			(0, PmbusBusWorkerPoolTest.OTHER_DEVICE_ADDRESS, "READ_VIN") : 36.0, (0, PmbusBusWorkerPoolTest.OTHER_DEVICE_ADDRESS, "READ_VOUT") : 11.5})
+
+	def test_invalid_device_type_is_rejected(self):
+		pool = PmbusBusWorkerPool(PmbusBusWorkerPoolTest.COMMAND_NAMES)
+		with self.assertRaises(PmbusBusWorkerInvalidDeviceType):
+			pool.add_device(0, "not_a_device", PmbusBusWorkerPoolTest.DEVICE_ADDRESS)
+
+	def test_device_address_must_be_unique_per_bus(self):
+		pool = PmbusBusWorkerPool(PmbusBusWorkerPoolTest.COMMAND_NAMES)
+		pool.add_device(0, "q48sc12050", PmbusBusWorkerPoolTest.DEVICE_ADDRESS)
+		pool.add_device(1, "q48sc12050", PmbusBusWorkerPoolTest.DEVICE_ADDRESS)
+		with self.assertRaises(PmbusBusWorkerDeviceAddressAlreadyExists):
+			pool.add_device(0, "q48sc12050", PmbusBusWorkerPoolTest.DEVICE_ADDRESS)
+
+	def test_read_before_start_is_rejected(self):
+		pool = PmbusBusWorkerPool(PmbusBusWorkerPoolTest.COMMAND_NAMES)
+		with self.assertRaises(PmbusBusWorkerPoolNotStarted):
+			pool.read_samples()
+
+if __name__ == "__main__":
+	unittest.main()
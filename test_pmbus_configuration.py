@@ -0,0 +1,168 @@
+import os
+import tempfile
+import unittest
+
+from fake_smbus import FakeSmbus
+from pmbus_configuration import *
+
+class PmbusConfigurationToolTest(unittest.TestCase):
+
+	DEVICE_ADDRESS = 0x29
+	STORE_DEFAULT_ALL_COMMAND_ADDRESS = 0x11
+
+	def setUp(self):
+		self.configuration_tool = PmbusConfigurationTool()
+		self.smbus_instances = [FakeSmbus(), FakeSmbus()]
+		# The same device address on two separate buses
+		self.devices = [q48sc12050(PmbusConfigurationToolTest.DEVICE_ADDRESS, smbus_instance) for smbus_instance in self.smbus_instances]
+		for device in self.devices:
+			self.set_linear_value(device, "VIN_ON", 34.0)
+			self.set_bytes(device, "ON_OFF_CONFIG", [0x1A])
+
+		self.golden_profile = PmbusConfigurationProfile()
+		self.golden_profile.set_entry("VIN_ON", 34.0)
+		self.golden_profile.set_entry("ON_OFF_CONFIG", [0x1A])
+
+	def get_command_address(self, device, command_name):
+		return device.get_command_table_entry(command_name).get_command_address()
+
+	def set_linear_value(self, device, command_name, value):
+		command_entry = device.get_command_table_entry(command_name)
+		device.smbus_instance.set_register(device.get_device_address(), command_entry.get_command_address(), device.get_linear_write_bytes(command_entry, value))
+
+	def set_bytes(self, device, command_name, bytes_to_set):
+		device.smbus_instance.set_register(device.get_device_address(), self.get_command_address(device, command_name), bytes_to_set)
+
+	def get_written_command_addresses(self, device):
+		return [transaction[2] for transaction in device.smbus_instance.get_writes()]
+
+	def test_matching_device_is_not_written(self):
+		differences = self.configuration_tool.apply_device(self.devices[0], self.golden_profile)
+		self.assertEqual(differences, [])
+		self.assertEqual(self.smbus_instances[0].get_writes(), [])
+
+	def test_apply_writes_only_differing_registers(self):
+		device = self.devices[0]
+		self.set_linear_value(device, "VIN_ON", 30.0)
+		differences = self.configuration_tool.apply_device(device, self.golden_profile)
+
+		self.assertEqual([difference.get_command_name() for difference in differences], ["VIN_ON"])
+		self.assertEqual(self.get_written_command_addresses(device), [self.get_command_address(device, "VIN_ON"), PmbusConfigurationToolTest.STORE_DEFAULT_ALL_COMMAND_ADDRESS])
+		self.assertEqual(self.configuration_tool.diff_device(device, self.golden_profile), [])
+
+	def test_store_default_all_is_sent_once_per_device(self):
+		device = self.devices[0]
+		self.set_linear_value(device, "VIN_ON", 30.0)
+		self.set_bytes(device, "ON_OFF_CONFIG", [0x1E])
+		self.configuration_tool.apply_device(device, self.golden_profile)
+
+		written_command_addresses = self.get_written_command_addresses(device)
+		self.assertEqual(len(written_command_addresses), 3)
+		self.assertEqual(written_command_addresses.count(PmbusConfigurationToolTest.STORE_DEFAULT_ALL_COMMAND_ADDRESS), 1)
+		self.assertEqual(written_command_addresses[-1], PmbusConfigurationToolTest.STORE_DEFAULT_ALL_COMMAND_ADDRESS)
+
+	def test_store_default_all_can_be_skipped(self):
+		device = self.devices[0]
+		self.set_linear_value(device, "VIN_ON", 30.0)
+		self.configuration_tool.apply_device(device, self.golden_profile, store_default_all=False)
+		self.assertEqual(self.get_written_command_addresses(device), [self.get_command_address(device, "VIN_ON")])
+
+	def test_value_within_tolerance_is_not_written(self):
+		device = self.devices[0]
+		self.set_linear_value(device, "VIN_ON", 34.5)
+		self.golden_profile.set_entry("VIN_ON", 34.0, 1.0)
+		self.assertEqual(self.configuration_tool.apply_device(device, self.golden_profile), [])
+		self.assertEqual(self.smbus_instances[0].get_writes(), [])
+
+	def assert_rejected_without_bus_traffic(self, configuration_function, error_class):
+		with self.assertRaises(error_class):
+			configuration_function()
+		for smbus_instance in self.smbus_instances:
+			self.assertEqual(smbus_instance.transactions, [])
+
+	def test_unknown_command_is_rejected_before_bus_traffic(self):
+		self.set_linear_value(self.devices[0], "VIN_ON", 30.0)
+		self.golden_profile.set_entry("NOT_A_COMMAND", 1.0)
+		self.assert_rejected_without_bus_traffic(lambda: self.configuration_tool.apply_device(self.devices[0], self.golden_profile), PmbusConfigurationUnknownCommand)
+
+	def test_read_only_command_is_rejected_before_bus_traffic(self):
+		self.set_linear_value(self.devices[0], "VIN_ON", 30.0)
+		self.golden_profile.set_entry("READ_VOUT", 12.0)
+		self.assert_rejected_without_bus_traffic(lambda: self.configuration_tool.apply_fleet(self.devices, self.golden_profile), PmbusConfigurationCommandNotAccessible)
+
+	def test_value_of_wrong_format_is_rejected_before_bus_traffic(self):
+		self.set_linear_value(self.devices[0], "VIN_ON", 30.0)
+		self.golden_profile.set_entry("ON_OFF_CONFIG", 26.0)
+		self.assert_rejected_without_bus_traffic(lambda: self.configuration_tool.apply_fleet_verified(self.devices, self.golden_profile), PmbusConfigurationInvalidProfileValue)
+
+	def test_fleet_results_are_kept_per_device_on_each_bus(self):
+		self.set_linear_value(self.devices[1], "VIN_ON", 30.0)
+		fleet_differences = self.configuration_tool.apply_fleet(self.devices, self.golden_profile)
+
+		self.assertEqual([device for device, differences in fleet_differences], self.devices)
+		self.assertEqual([len(differences) for device, differences in fleet_differences], [0, 1])
+		self.assertEqual(self.smbus_instances[0].get_writes(), [])
+		self.assertEqual(self.get_written_command_addresses(self.devices[1]), [self.get_command_address(self.devices[1], "VIN_ON"), PmbusConfigurationToolTest.STORE_DEFAULT_ALL_COMMAND_ADDRESS])
+
+	def test_verified_fleet_apply_is_kept_per_device_on_each_bus(self):
+		self.set_linear_value(self.devices[0], "VIN_ON", 30.0)
+		fleet_differences, report = self.configuration_tool.apply_fleet_verified(self.devices, self.golden_profile)
+
+		self.assertTrue(report.is_verified())
+		self.assertEqual([len(differences) for device, differences in fleet_differences], [1, 0])
+		self.assertEqual(self.get_written_command_addresses(self.devices[0]), [self.get_command_address(self.devices[0], "VIN_ON"), PmbusConfigurationToolTest.STORE_DEFAULT_ALL_COMMAND_ADDRESS])
+		self.assertEqual(self.smbus_instances[1].get_writes(), [])
+
+	def test_snapshot_excludes_operational_commands_by_default(self):
+		command_names = [command_entry.get_command_name() for command_entry in self.configuration_tool.get_configuration_commands(self.devices[0])]
+		self.assertNotIn("OPERATION", command_names)
+		self.assertNotIn("VOUT_COMMAND", command_names)
+		self.assertIn("VIN_ON", command_names)
+
+		command_names = [command_entry.get_command_name() for command_entry in self.configuration_tool.get_configuration_commands(self.devices[0], include_operational=True)]
+		self.assertIn("OPERATION", command_names)
+
+class PmbusConfigurationProfileTest(unittest.TestCase):
+
+	def setUp(self):
+		self.command_table = q48sc12050(0x29, None).command_table
+		profile_file = tempfile.NamedTemporaryFile('w', suffix=".csv", delete=False)
+		self.profile_file_path = profile_file.name
+		profile_file.close()
+
+	def tearDown(self):
+		os.remove(self.profile_file_path)
+
+	def load_profile_lines(self, lines, command_table=None):
+		profile_file = open(self.profile_file_path, 'w')
+		profile_file.write(PmbusConfigurationProfile.HEADERS_LINE + "\n" + "\n".join(lines) + "\n")
+		profile_file.close()
+		return PmbusConfigurationProfile(self.profile_file_path, command_table)
+
+	def test_values_are_parsed_against_command_format(self):
+		golden_profile = self.load_profile_lines(["VIN_ON,34,0.5", "ON_OFF_CONFIG,26,"], self.command_table)
+		self.assertEqual(golden_profile.get_value("VIN_ON"), 34.0)
+		self.assertEqual(golden_profile.get_tolerance("VIN_ON"), 0.5)
+		self.assertEqual(golden_profile.get_value("ON_OFF_CONFIG"), [0x1A])
+		self.assertEqual(golden_profile.get_tolerance("ON_OFF_CONFIG"), None)
+
+	def test_value_not_matching_command_format_is_rejected(self):
+		for line in ["VIN_ON,0x22,", "ON_OFF_CONFIG,0x1A 0x00,", "ON_OFF_CONFIG,1.5,"]:
+			with self.assertRaises(PmbusConfigurationInvalidProfileValue):
+				self.load_profile_lines([line], self.command_table)
+
+	def test_unknown_command_is_rejected(self):
+		with self.assertRaises(PmbusConfigurationUnknownCommand):
+			self.load_profile_lines(["NOT_A_COMMAND,1,"], self.command_table)
+
+	def test_saved_profile_loads_back(self):
+		golden_profile = PmbusConfigurationProfile()
+		golden_profile.set_entry("VIN_ON", 34.0, 0.25)
+		golden_profile.set_entry("ON_OFF_CONFIG", [0x1A])
+		golden_profile.save_profile(self.profile_file_path)
+
+		loaded_profile = PmbusConfigurationProfile(self.profile_file_path, self.command_table)
+		self.assertEqual(loaded_profile.profile_entries, golden_profile.profile_entries)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,129 @@
+import errno
+import tempfile
+import unittest
+
+from fake_smbus import FakeSmbus
+from pmbus_adaptive_polling import PmbusAdaptivePoller
+from pmbus_devices import q48sc12050
+from pmbus_transaction_recording import *
+
+class PmbusTransactionRecordingTest(unittest.TestCase):
+
+	DEVICE_ADDRESS = 0x29
+	OTHER_DEVICE_ADDRESS = 0x2A
+	READ_VOUT_COMMAND_ADDRESS = 0x8B
+	READ_VIN_COMMAND_ADDRESS = 0x88
+	ON_OFF_CONFIG_COMMAND_ADDRESS = 0x02
+	CLEAR_FAULTS_COMMAND_ADDRESS = 0x03
+
+	def setUp(self):
+		self.recording_directory = tempfile.TemporaryDirectory()
+		self.file_path = PmbusTransactionFile.get_recording_file_path(self.recording_directory.name, 0)
+		self.smbus_instance = FakeSmbus()
+		self.smbus_instance.set_register(PmbusTransactionRecordingTest.DEVICE_ADDRESS, PmbusTransactionRecordingTest.READ_VOUT_COMMAND_ADDRESS, [0x00, 0xC0])
+		table_device = q48sc12050(PmbusTransactionRecordingTest.DEVICE_ADDRESS, None)
+		self.read_vin_bytes = table_device.get_linear_write_bytes(table_device.get_command_table_entry("READ_VIN"), 48.0)
+		self.smbus_instance.set_register(PmbusTransactionRecordingTest.DEVICE_ADDRESS, PmbusTransactionRecordingTest.READ_VIN_COMMAND_ADDRESS, self.read_vin_bytes)
+
+	def tearDown(self):
+		self.recording_directory.cleanup()
+
+	def record_session(self):
+		recorder = PmbusTransactionRecorder(self.smbus_instance, self.file_path)
+		recorder.read_i2c_block_data(PmbusTransactionRecordingTest.DEVICE_ADDRESS, PmbusTransactionRecordingTest.READ_VOUT_COMMAND_ADDRESS, 2)
+		recorder.write_i2c_block_data(PmbusTransactionRecordingTest.DEVICE_ADDRESS, PmbusTransactionRecordingTest.ON_OFF_CONFIG_COMMAND_ADDRESS, [0x1A])
+		recorder.write_byte(PmbusTransactionRecordingTest.DEVICE_ADDRESS, PmbusTransactionRecordingTest.CLEAR_FAULTS_COMMAND_ADDRESS)
+		self.smbus_instance.failing_registers.add((PmbusTransactionRecordingTest.OTHER_DEVICE_ADDRESS, PmbusTransactionRecordingTest.READ_VOUT_COMMAND_ADDRESS))
+		with self.assertRaises(OSError):
+			recorder.read_i2c_block_data(PmbusTransactionRecordingTest.OTHER_DEVICE_ADDRESS, PmbusTransactionRecordingTest.READ_VOUT_COMMAND_ADDRESS, 2)
+		recorder.read_i2c_block_data(PmbusTransactionRecordingTest.DEVICE_ADDRESS, PmbusTransactionRecordingTest.READ_VIN_COMMAND_ADDRESS, 2)
+		recorder.close()
+
+	def test_recording_file_holds_every_transaction(self):
+		self.record_session()
+		transactions = PmbusTransactionFile.read_transactions(self.file_path)
+
+		self.assertEqual([transaction.get_operation() for transaction in transactions], [PmbusTransaction.OPERATION_READ_I2C_BLOCK_DATA, PmbusTransaction.OPERATION_WRITE_I2C_BLOCK_DATA,
+			PmbusTransaction.OPERATION_WRITE_BYTE, PmbusTransaction.OPERATION_READ_I2C_BLOCK_DATA, PmbusTransaction.OPERATION_READ_I2C_BLOCK_DATA])
+		self.assertEqual(transactions[0].get_result(), [0x00, 0xC0])
+		self.assertEqual(transactions[1].get_payload(), [0x1A])
+		self.assertTrue(transactions[3].is_error())
+		self.assertEqual(transactions[3].get_error_number(), errno.EIO)
+		self.assertFalse(transactions[4].is_error())
+
+	def test_replay_serves_recorded_results_and_errors(self):
+		self.record_session()
+		replay_bus = PmbusReplayBus(self.file_path, time_scale=0)
+
+		self.assertEqual(replay_bus.read_i2c_block_data(PmbusTransactionRecordingTest.DEVICE_ADDRESS, PmbusTransactionRecordingTest.READ_VOUT_COMMAND_ADDRESS, 2), [0x00, 0xC0])
+		replay_bus.write_i2c_block_data(PmbusTransactionRecordingTest.DEVICE_ADDRESS, PmbusTransactionRecordingTest.ON_OFF_CONFIG_COMMAND_ADDRESS, [0x1A])
+		replay_bus.write_byte(PmbusTransactionRecordingTest.DEVICE_ADDRESS, PmbusTransactionRecordingTest.CLEAR_FAULTS_COMMAND_ADDRESS)
+		with self.assertRaises(OSError) as context:
+			replay_bus.read_i2c_block_data(PmbusTransactionRecordingTest.OTHER_DEVICE_ADDRESS, PmbusTransactionRecordingTest.READ_VOUT_COMMAND_ADDRESS, 2)
+		self.assertEqual(context.exception.errno, errno.EIO)
+		self.assertEqual(replay_bus.read_i2c_block_data(PmbusTransactionRecordingTest.DEVICE_ADDRESS, PmbusTransactionRecordingTest.READ_VIN_COMMAND_ADDRESS, 2), self.read_vin_bytes)
+		self.assertEqual(replay_bus.get_num_transactions_replayed(), replay_bus.get_num_transactions())
+
+	def test_replay_keeps_order_per_register_only(self):
+		self.record_session()
+		replay_bus = PmbusReplayBus(self.file_path, time_scale=0)
+
+		self.assertEqual(replay_bus.read_i2c_block_data(PmbusTransactionRecordingTest.DEVICE_ADDRESS, PmbusTransactionRecordingTest.READ_VIN_COMMAND_ADDRESS, 2), self.read_vin_bytes)
+		self.assertEqual(replay_bus.read_i2c_block_data(PmbusTransactionRecordingTest.DEVICE_ADDRESS, PmbusTransactionRecordingTest.READ_VOUT_COMMAND_ADDRESS, 2), [0x00, 0xC0])
+
+	def test_write_with_different_payload_is_a_mismatch(self):
+		self.record_session()
+		replay_bus = PmbusReplayBus(self.file_path, time_scale=0)
+		with self.assertRaises(PmbusTransactionReplayMismatch):
+			replay_bus.write_i2c_block_data(PmbusTransactionRecordingTest.DEVICE_ADDRESS, PmbusTransactionRecordingTest.ON_OFF_CONFIG_COMMAND_ADDRESS, [0x1E])
+
+		replay_bus = PmbusReplayBus(self.file_path, time_scale=0, verify_writes=False)
+		replay_bus.write_i2c_block_data(PmbusTransactionRecordingTest.DEVICE_ADDRESS, PmbusTransactionRecordingTest.ON_OFF_CONFIG_COMMAND_ADDRESS, [0x1E])
+
+	def test_different_operation_on_a_register_is_a_mismatch(self):
+		self.record_session()
+		replay_bus = PmbusReplayBus(self.file_path, time_scale=0)
+		with self.assertRaises(PmbusTransactionReplayMismatch):
+			replay_bus.read_i2c_block_data(PmbusTransactionRecordingTest.DEVICE_ADDRESS, PmbusTransactionRecordingTest.ON_OFF_CONFIG_COMMAND_ADDRESS, 1)
+
+	def test_unrecorded_or_exhausted_register_is_reported(self):
+		self.record_session()
+		replay_bus = PmbusReplayBus(self.file_path, time_scale=0)
+		replay_bus.read_i2c_block_data(PmbusTransactionRecordingTest.DEVICE_ADDRESS, PmbusTransactionRecordingTest.READ_VOUT_COMMAND_ADDRESS, 2)
+		with self.assertRaises(PmbusTransactionReplayExhausted):
+			replay_bus.read_i2c_block_data(PmbusTransactionRecordingTest.DEVICE_ADDRESS, PmbusTransactionRecordingTest.READ_VOUT_COMMAND_ADDRESS, 2)
+		with self.assertRaises(PmbusTransactionReplayExhausted):
+			replay_bus.read_i2c_block_data(PmbusTransactionRecordingTest.DEVICE_ADDRESS, 0x8C, 2)
+
+	def test_file_without_header_is_rejected(self):
+		output_file = open(self.file_path, 'wb')
+		output_file.write(b"not a recording")
+		output_file.close()
+		with self.assertRaises(PmbusTransactionRecordingInvalidFile):
+			PmbusReplayBus(self.file_path)
+
+	def test_replay_factory_opens_recording_for_bus_number(self):
+		self.record_session()
+		replay_bus = PmbusReplaySmbusFactory(self.recording_directory.name, 0)(0)
+		self.assertEqual(replay_bus.get_file_path(), self.file_path)
+		self.assertEqual(replay_bus.get_num_transactions(), 5)
+
+	def test_poll_replays_with_a_different_schedule(self):
+		recorder = PmbusTransactionRecorder(self.smbus_instance, self.file_path)
+		poller = PmbusAdaptivePoller(min_period=0.1, max_period=0.4)
+		poller.add_device(q48sc12050(PmbusTransactionRecordingTest.DEVICE_ADDRESS, recorder), ["READ_VOUT", "READ_VIN"])
+		for i in range(20):
+			poller.poll_once(i * 0.1)
+		recorder.close()
+
+		# Reverse channel order so the cross-register interleaving differs from the recording
+		replay_poller = PmbusAdaptivePoller(min_period=0.1, max_period=0.4)
+		replay_poller.add_device(q48sc12050(PmbusTransactionRecordingTest.DEVICE_ADDRESS, PmbusReplayBus(self.file_path, time_scale=0)), ["READ_VIN", "READ_VOUT"])
+		events = []
+		for i in range(20):
+			events += replay_poller.poll_once(i * 0.1)
+		self.assertEqual([event.get_error() for event in events], [None] * len(events))
+		self.assertEqual(sorted(event.get_command_name() for event in events), ["READ_VIN", "READ_VOUT", "STATUS_WORD"])
+
+if __name__ == "__main__":
+	unittest.main()
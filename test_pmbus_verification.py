@@ -0,0 +1,129 @@
+import unittest
+
+from fake_smbus import FakeSmbus
+from pmbus_verification import *
+
+class RoundingSmbus(FakeSmbus):
+	"""
+	FakeSmbus that stores every block write to one register as
+	a different value, as a device rounding to its own
+	resolution would
+	"""
+
+	def __init__(self, rounded_command_address, rounded_bytes):
+		super().__init__()
+		self.rounded_command_address = rounded_command_address
+		self.rounded_bytes = rounded_bytes
+
+	def write_i2c_block_data(self, i2c_addr, register, data, force=None):
+		super().write_i2c_block_data(i2c_addr, register, data, force)
+		if register == self.rounded_command_address:
+			self.set_register(i2c_addr, register, self.rounded_bytes)
+
+class PmbusVerifiedWriterTest(unittest.TestCase):
+
+	DEVICE_ADDRESS = 0x29
+	OTHER_DEVICE_ADDRESS = 0x2A
+
+	def setUp(self):
+		self.smbus_instance = FakeSmbus()
+		self.device = q48sc12050(PmbusVerifiedWriterTest.DEVICE_ADDRESS, self.smbus_instance)
+		self.other_device = q48sc12050(PmbusVerifiedWriterTest.OTHER_DEVICE_ADDRESS, self.smbus_instance)
+		self.verified_writer = PmbusVerifiedWriter()
+
+	def get_command_address(self, command_name):
+		return self.device.get_command_table_entry(command_name).get_command_address()
+
+	def get_linear_bytes(self, command_name, value):
+		return self.device.get_linear_write_bytes(self.device.get_command_table_entry(command_name), value)
+
+	def get_lsb(self, command_name):
+		return 2 ** self.device.get_command_table_entry(command_name).get_exponent()
+
+	def test_every_write_on_a_bus_is_issued_before_any_readback(self):
+		for device in (self.device, self.other_device):
+			self.verified_writer.queue_write(device, "VIN_ON", self.get_linear_bytes("VIN_ON", 34.0))
+			self.verified_writer.queue_write(device, "ON_OFF_CONFIG", [0x1A])
+		report = self.verified_writer.execute()
+
+		operations = [transaction[0] for transaction in self.smbus_instance.transactions]
+		self.assertEqual(operations, ["write_i2c_block_data"] * 4 + ["read_i2c_block_data"] * 4)
+		self.assertTrue(report.is_verified())
+		self.assertEqual([verified_write.get_status() for verified_write in report.get_results()], [PmbusVerifiedWrite.STATUS_VERIFIED] * 4)
+
+	def test_only_the_last_write_to_a_register_is_read_back(self):
+		self.verified_writer.queue_write(self.device, "VIN_ON", self.get_linear_bytes("VIN_ON", 33.0))
+		self.verified_writer.queue_write(self.device, "VIN_ON", self.get_linear_bytes("VIN_ON", 34.0))
+		report = self.verified_writer.execute()
+
+		self.assertEqual(self.smbus_instance.num_reads, 1)
+		self.assertEqual([verified_write.get_status() for verified_write in report.get_results()], [PmbusVerifiedWrite.STATUS_UNVERIFIED, PmbusVerifiedWrite.STATUS_VERIFIED])
+
+	def test_send_byte_command_is_unverified(self):
+		self.verified_writer.queue_write(self.device, "CLEAR_FAULTS")
+		report = self.verified_writer.execute()
+
+		self.assertEqual(self.smbus_instance.num_reads, 0)
+		self.assertEqual(report.get_results()[0].get_status(), PmbusVerifiedWrite.STATUS_UNVERIFIED)
+		self.assertTrue(report.is_verified())
+
+	def assert_rounded_readback_status(self, rounded_value, expected_status):
+		rounding_smbus_instance = RoundingSmbus(self.get_command_address("VIN_ON"), self.get_linear_bytes("VIN_ON", rounded_value))
+		device = q48sc12050(PmbusVerifiedWriterTest.DEVICE_ADDRESS, rounding_smbus_instance)
+		self.verified_writer.queue_write(device, "VIN_ON", self.get_linear_bytes("VIN_ON", 34.0))
+		report = self.verified_writer.execute()
+		self.assertEqual(report.get_results()[0].get_status(), expected_status)
+
+	def test_linear_readback_one_lsb_off_is_verified(self):
+		self.assert_rounded_readback_status(34.0 + self.get_lsb("VIN_ON"), PmbusVerifiedWrite.STATUS_VERIFIED)
+		self.assert_rounded_readback_status(34.0 - self.get_lsb("VIN_ON"), PmbusVerifiedWrite.STATUS_VERIFIED)
+
+	def test_linear_readback_two_lsbs_off_is_a_mismatch(self):
+		self.assert_rounded_readback_status(34.0 + 2 * self.get_lsb("VIN_ON"), PmbusVerifiedWrite.STATUS_MISMATCH)
+
+	def test_non_linear_readback_must_match_exactly(self):
+		rounding_smbus_instance = RoundingSmbus(self.get_command_address("ON_OFF_CONFIG"), [0x1B])
+		device = q48sc12050(PmbusVerifiedWriterTest.DEVICE_ADDRESS, rounding_smbus_instance)
+		self.verified_writer.queue_write(device, "ON_OFF_CONFIG", [0x1A])
+		report = self.verified_writer.execute()
+
+		verified_write = report.get_results()[0]
+		self.assertEqual(verified_write.get_status(), PmbusVerifiedWrite.STATUS_MISMATCH)
+		self.assertEqual(verified_write.get_bytes_read(), [0x1B])
+		self.assertFalse(report.is_verified())
+
+	def test_failed_write_is_not_read_back(self):
+		self.smbus_instance.failing_registers.add((PmbusVerifiedWriterTest.DEVICE_ADDRESS, self.get_command_address("ON_OFF_CONFIG")))
+		self.verified_writer.queue_write(self.device, "ON_OFF_CONFIG", [0x1A])
+		self.verified_writer.queue_write(self.other_device, "ON_OFF_CONFIG", [0x1A])
+		report = self.verified_writer.execute()
+
+		self.assertEqual([verified_write.get_status() for verified_write in report.get_results()], [PmbusVerifiedWrite.STATUS_WRITE_ERROR, PmbusVerifiedWrite.STATUS_VERIFIED])
+		self.assertEqual(self.smbus_instance.num_reads, 1)
+
+	def test_invalid_write_is_rejected_when_queued(self):
+		with self.assertRaises(PmbusDeviceWriteEnableError):
+			self.verified_writer.queue_write(self.device, "READ_VOUT", [0x00, 0x00])
+		with self.assertRaises(PmbusDeviceInvalidNumberOfWriteBytes):
+			self.verified_writer.queue_write(self.device, "ON_OFF_CONFIG", [0x1A, 0x00])
+		self.assertEqual(self.verified_writer.get_num_queued_writes(), 0)
+
+	def test_device_verification_is_per_device_on_each_bus(self):
+		other_bus_device = q48sc12050(PmbusVerifiedWriterTest.DEVICE_ADDRESS, RoundingSmbus(self.get_command_address("ON_OFF_CONFIG"), [0x1B]))
+		self.verified_writer.queue_write(self.device, "ON_OFF_CONFIG", [0x1A])
+		self.verified_writer.queue_write(other_bus_device, "ON_OFF_CONFIG", [0x1A])
+		report = self.verified_writer.execute()
+
+		self.assertTrue(report.is_device_verified(self.device))
+		self.assertFalse(report.is_device_verified(other_bus_device))
+
+	def test_writes_are_grouped_by_bus(self):
+		other_bus_device = q48sc12050(PmbusVerifiedWriterTest.DEVICE_ADDRESS, FakeSmbus())
+		for device in (self.device, self.other_device, other_bus_device):
+			self.verified_writer.queue_write(device, "ON_OFF_CONFIG", [0x1A])
+
+		bus_queues = self.verified_writer.group_writes_by_bus()
+		self.assertEqual([[verified_write.get_device() for verified_write in bus_queue] for bus_queue in bus_queues], [[self.device, self.other_device], [other_bus_device]])
+
+if __name__ == "__main__":
+	unittest.main()